@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+from dotenv import load_dotenv
+from ai.prompts import build_prompt
+from ai.service import LLM_MODEL, DEFAULT_TEMPERATURE
+from db.mongodb import database
+from utils.lru_cache import TTLCache
+
+load_dotenv()
+
+# Generation cache configuration
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "1000"))
+AI_CACHE_TTL_SECONDS = int(os.getenv("AI_CACHE_TTL_SECONDS", "86400"))
+AI_CACHE_SHARED = os.getenv("AI_CACHE_SHARED", "false").lower() == "true"
+
+local_cache = TTLCache(AI_CACHE_MAX_ENTRIES, AI_CACHE_TTL_SECONDS)
+
+# Counters for the optional MongoDB tier
+shared_stats = {"hits": 0, "misses": 0}
+
+
+def normalize(value: str) -> str:
+    """Lowercase and collapse whitespace so trivially different inputs share a key"""
+    return " ".join(value.split()).lower()
+
+
+def make_cache_key(topic: str, tone: str, hook: str, cta: str, length: str = "medium") -> str:
+    """Build the cache key from the normalized prompt plus model settings"""
+    system_prompt, user_prompt = build_prompt(
+        normalize(topic), normalize(tone), normalize(hook), normalize(cta), normalize(length)
+    )
+    raw = json.dumps([system_prompt, user_prompt, LLM_MODEL, DEFAULT_TEMPERATURE])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def get_cached_post(key: str) -> Optional[str]:
+    """Look up a generated post, in process first and then in MongoDB if enabled"""
+    content = local_cache.get(key)
+    if content is not None or not AI_CACHE_SHARED:
+        return content
+
+    record = await database.generation_cache.find_one({
+        "_id": key,
+        "expires_at": {"$gt": datetime.utcnow()}
+    })
+    if not record:
+        shared_stats["misses"] += 1
+        return None
+
+    shared_stats["hits"] += 1
+    local_cache.set(key, record["content"])
+    return record["content"]
+
+
+async def store_post(key: str, content: str) -> None:
+    """Store a generated post in every enabled cache tier"""
+    local_cache.set(key, content)
+
+    if AI_CACHE_SHARED:
+        await database.generation_cache.update_one(
+            {"_id": key},
+            {"$set": {
+                "content": content,
+                "expires_at": datetime.utcnow() + timedelta(seconds=AI_CACHE_TTL_SECONDS)
+            }},
+            upsert=True
+        )
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters for both cache tiers"""
+    return {
+        "local": local_cache.stats(),
+        "shared": {"enabled": AI_CACHE_SHARED, **shared_stats}
+    }
@@ -1,4 +1,11 @@
-def build_prompt(topic: str, tone: str, hook: str, cta: str):
+LENGTH_GUIDANCE = {
+    "short": "Keep it under 80 words.",
+    "medium": "Aim for 120 to 180 words.",
+    "long": "Aim for 250 to 300 words.",
+}
+
+
+def build_prompt(topic: str, tone: str, hook: str, cta: str, length: str = "medium"):
     system_prompt = "You are a professional Linked Content Writer. Write concise, engaging posts with clear structure."
 
     user_prompt = f"""
@@ -6,11 +13,13 @@ def build_prompt(topic: str, tone: str, hook: str, cta: str):
     Tone: {tone}
     Hook: {hook}
     CTA: {cta}
+    Length: {length}
 
     Write a LinkedIn post with:
      - Strong opening hook
      - Short paragraphs
      - Clear CTA at the end
+     - {LENGTH_GUIDANCE.get(length, LENGTH_GUIDANCE["medium"])}
     """
 
-    return system_prompt, user_prompt
\ No newline at end of file
+    return system_prompt, user_prompt
@@ -0,0 +1,199 @@
+from abc import ABC, abstractmethod
+from groq import AsyncGroq, DefaultAsyncHttpxClient
+import asyncio
+import hashlib
+import httpx
+import os
+import random
+from typing import AsyncIterator, List
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Which backend serves generations: "groq" or "stub"
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq").lower()
+
+# Groq configuration
+GROQ_MODEL = "llama-3.3-70b-versatile"  # Updated to current model
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None  # Point at a local fake server for load tests
+GROQ_TIMEOUT_SECONDS = float(os.getenv("GROQ_TIMEOUT_SECONDS", "30"))
+GROQ_CONNECT_TIMEOUT_SECONDS = float(os.getenv("GROQ_CONNECT_TIMEOUT_SECONDS", "5"))
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "20"))
+
+# Stub configuration
+STUB_MODEL = "local-stub"
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "200"))
+STUB_LATENCY_JITTER_MS = float(os.getenv("STUB_LATENCY_JITTER_MS", "0"))
+STUB_LATENCY_DISTRIBUTION = os.getenv("STUB_LATENCY_DISTRIBUTION", "fixed")  # fixed, uniform, exponential, lognormal
+STUB_ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", "0"))
+STUB_STREAM_CHUNK_DELAY_MS = float(os.getenv("STUB_STREAM_CHUNK_DELAY_MS", "20"))
+STUB_SEED = os.getenv("STUB_SEED")
+
+
+class LLMProvider(ABC):
+    """Interface every generation backend implements"""
+
+    name = "base"
+    model = ""
+
+    @abstractmethod
+    async def complete(self, messages: List[dict], temperature: float, max_tokens: int) -> str:
+        """Return the full completion text"""
+
+    @abstractmethod
+    def stream(self, messages: List[dict], temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        """Yield completion text deltas as they are produced"""
+
+    async def close(self) -> None:
+        """Release any connections held by the provider"""
+
+
+class GroqProvider(LLMProvider):
+    """Groq chat completions over a shared, pooled HTTP connection"""
+
+    name = "groq"
+    model = GROQ_MODEL
+
+    def __init__(self):
+        self.client = AsyncGroq(
+            api_key=os.getenv("GROQ_API_KEY"),
+            base_url=GROQ_BASE_URL,
+            timeout=httpx.Timeout(GROQ_TIMEOUT_SECONDS, connect=GROQ_CONNECT_TIMEOUT_SECONDS),
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=GROQ_MAX_CONNECTIONS,
+                    max_keepalive_connections=GROQ_MAX_CONNECTIONS,
+                )
+            ),
+        )
+
+    async def complete(self, messages, temperature, max_tokens):
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        return response.choices[0].message.content
+
+    async def stream(self, messages, temperature, max_tokens):
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        # Close the response when the caller stops early (e.g. the client
+        # disconnected), instead of leaving the connection to the garbage collector
+        async with stream:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+
+    async def close(self):
+        await self.client.close()
+
+
+class StubProviderError(Exception):
+    """Injected failure from the stub provider"""
+
+
+class StubProvider(LLMProvider):
+    """
+    Offline provider for load tests, benchmarks and CI.
+    Returns deterministic text for a given prompt, with configurable
+    latency distribution, error rate and streaming speed.
+    """
+
+    name = "stub"
+    model = STUB_MODEL
+
+    OPENINGS = [
+        "Ever wondered why this matters more than ever?",
+        "Here is a number that surprised me this week.",
+        "Last year I learned this the hard way.",
+        "Most people get this wrong.",
+    ]
+    BODIES = [
+        "Small, consistent steps beat big plans that never ship.",
+        "The teams that win are the ones that measure what matters.",
+        "Clarity in communication saves more time than any tool.",
+        "Curiosity compounds faster than experience alone.",
+    ]
+    CLOSINGS = [
+        "What do you think? Share your view in the comments.",
+        "If this resonated, share it with your network.",
+        "Let's connect and keep the conversation going.",
+    ]
+
+    def __init__(self):
+        self.rng = random.Random(STUB_SEED)
+
+    def _latency_seconds(self) -> float:
+        base = STUB_LATENCY_MS
+        jitter = STUB_LATENCY_JITTER_MS
+        if STUB_LATENCY_DISTRIBUTION == "uniform":
+            delay = self.rng.uniform(base - jitter, base + jitter)
+        elif STUB_LATENCY_DISTRIBUTION == "exponential":
+            delay = self.rng.expovariate(1 / base) if base > 0 else 0
+        elif STUB_LATENCY_DISTRIBUTION == "lognormal":
+            # jitter is the spread (sigma) in ms, giving a long right tail
+            sigma = jitter / base if base > 0 else 0
+            delay = self.rng.lognormvariate(0, sigma) * base
+        else:
+            delay = base
+        return max(delay, 0) / 1000
+
+    def _maybe_fail(self):
+        if STUB_ERROR_RATE and self.rng.random() < STUB_ERROR_RATE:
+            raise StubProviderError("Injected stub provider error")
+
+    def _text(self, messages: List[dict], max_tokens: int) -> str:
+        prompt = "\n".join(m["content"] for m in messages)
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+
+        topic = ""
+        for line in prompt.splitlines():
+            if line.strip().startswith("Topic:"):
+                topic = line.split(":", 1)[1].strip()
+                break
+
+        text = "\n\n".join([
+            self.OPENINGS[digest[0] % len(self.OPENINGS)],
+            f"Let's talk about {topic or 'this'}.",
+            self.BODIES[digest[1] % len(self.BODIES)],
+            self.CLOSINGS[digest[2] % len(self.CLOSINGS)],
+        ])
+        # Respect max_tokens roughly (about 4 characters per token)
+        return text[:max_tokens * 4]
+
+    async def complete(self, messages, temperature, max_tokens):
+        await asyncio.sleep(self._latency_seconds())
+        self._maybe_fail()
+        return self._text(messages, max_tokens)
+
+    async def stream(self, messages, temperature, max_tokens):
+        # Latency models time to first token, then words arrive at a steady pace
+        await asyncio.sleep(self._latency_seconds())
+        self._maybe_fail()
+        for i, word in enumerate(self._text(messages, max_tokens).split(" ")):
+            if i:
+                await asyncio.sleep(STUB_STREAM_CHUNK_DELAY_MS / 1000)
+            yield word if i == 0 else " " + word
+
+
+PROVIDERS = {
+    "groq": GroqProvider,
+    "stub": StubProvider,
+}
+
+
+def get_provider() -> LLMProvider:
+    """Create the provider selected by LLM_PROVIDER"""
+    if LLM_PROVIDER not in PROVIDERS:
+        raise ValueError(f"Unknown LLM_PROVIDER '{LLM_PROVIDER}', expected one of {list(PROVIDERS)}")
+    return PROVIDERS[LLM_PROVIDER]()
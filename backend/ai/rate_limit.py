@@ -1,24 +1,192 @@
-from datetime import date
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict
+from dotenv import load_dotenv
 from fastapi import HTTPException
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from db.mongodb import database
+from utils.lru_cache import TTLCache
+
+load_dotenv()
 
 MAX_DAILY_POSTS = 5
 
-async def check_rate_limit(email: str):
+# "daily" resets at midnight, "sliding" counts the last RATE_LIMIT_WINDOW_SECONDS
+RATE_LIMIT_MODE = os.getenv("RATE_LIMIT_MODE", "daily")
+RATE_LIMIT_WINDOW_SECONDS = int(os.getenv("RATE_LIMIT_WINDOW_SECONDS", "86400"))
+
+# Per-plan limits, e.g. "free:5,pro:50". Users without a plan are on "free".
+PLAN_LIMITS = {"free": MAX_DAILY_POSTS}
+for entry in os.getenv("AI_PLAN_LIMITS", "").split(","):
+    if ":" in entry:
+        plan, limit = entry.split(":", 1)
+        PLAN_LIMITS[plan.strip()] = int(limit)
+
+# Optional in-process front: admit from a local bucket and sync counts to ai_usage
+# in the background (daily mode only). Slightly over-admits across workers
+# between syncs in exchange for no Mongo round trip per generation.
+RATE_LIMIT_LOCAL = os.getenv("RATE_LIMIT_LOCAL", "false").lower() == "true"
+RATE_LIMIT_SYNC_SECONDS = int(os.getenv("RATE_LIMIT_SYNC_SECONDS", "5"))
+
+plan_cache = TTLCache(10000, 300)
+
+# Structure: {record_id: {"email": str, "date": str, "used": int, "pending": int}}
+local_buckets: Dict[str, dict] = {}
+
+
+async def get_user_limit(email: str) -> int:
+    """Return the generation limit for the user's plan"""
+    plan = plan_cache.get(email)
+    if plan is None:
+        user = await database.users.find_one({"email": email}, {"plan": 1})
+        plan = (user or {}).get("plan") or "free"
+        plan_cache.set(email, plan)
+    return PLAN_LIMITS.get(plan, MAX_DAILY_POSTS)
+
+
+async def check_rate_limit(email: str, count: int = 1):
+    """
+    Charge `count` generations against the user's quota in one atomic operation.
+    Raises 429 if the charge would go past the plan limit.
+    """
+    limit = await get_user_limit(email)
+    if count > limit:
+        raise HTTPException(status_code=429, detail="Daily limit exceeded")
+
+    if RATE_LIMIT_MODE == "sliding":
+        await _charge_sliding_window(email, count, limit)
+    elif RATE_LIMIT_LOCAL:
+        await _charge_local_bucket(email, count, limit)
+    else:
+        await _charge_daily(email, count, limit)
+
+
+async def refund_rate_limit(email: str, count: int = 1):
+    """Give back quota charged for generations that failed"""
+    if count <= 0:
+        return
+
+    if RATE_LIMIT_MODE == "sliding":
+        # Drop the newest `count` hits
+        await database.ai_usage.update_one(
+            {"_id": f"{email}_sliding"},
+            [{"$set": {"hits": {"$slice": [
+                "$hits", {"$max": [0, {"$subtract": [{"$size": "$hits"}, count]}]}
+            ]}}}]
+        )
+        return
+
+    record_id = f"{email}_{date.today()}"
+    bucket = local_buckets.get(record_id)
+    if RATE_LIMIT_LOCAL and bucket:
+        bucket["used"] -= count
+        bucket["pending"] -= count
+        return
+
+    await database.ai_usage.update_one({"_id": record_id}, {"$inc": {"count": -count}})
+
+
+async def _charge_daily(email: str, count: int, limit: int):
     today = str(date.today())
     # Use composite key: email_date as _id to avoid conflicts
     record_id = f"{email}_{today}"
-    
-    record = await database.ai_usage.find_one({"_id": record_id})
-    if record and record["count"] >= MAX_DAILY_POSTS:
-        raise HTTPException(status_code=429, detail="Daily limit exceeded")
-   
-    if record:
-        await database.ai_usage.update_one({"_id": record_id}, {"$inc": {"count": 1}})
-    else:
-        await database.ai_usage.insert_one({
-            "_id": record_id,
+
+    # Only match while there is room left, so concurrent requests cannot overshoot
+    query = {"_id": record_id, "count": {"$lte": limit - count}}
+    update = {
+        "$inc": {"count": count},
+        "$setOnInsert": {"email": email, "date": today, "created_at": datetime.utcnow()}
+    }
+
+    try:
+        await database.ai_usage.update_one(query, update, upsert=True)
+    except DuplicateKeyError:
+        # Record exists but is full, or another request inserted it first
+        result = await database.ai_usage.update_one(query, update)
+        if result.matched_count == 0:
+            raise HTTPException(status_code=429, detail="Daily limit exceeded")
+
+
+async def _charge_sliding_window(email: str, count: int, limit: int):
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=RATE_LIMIT_WINDOW_SECONDS)
+
+    # Prune expired hits, then append only if there is room, all in one update
+    record = await database.ai_usage.find_one_and_update(
+        {"_id": f"{email}_sliding"},
+        [
+            {"$set": {
+                "email": email,
+                "hits": {"$filter": {
+                    "input": {"$ifNull": ["$hits", []]},
+                    "cond": {"$gt": ["$$this", cutoff]}
+                }}
+            }},
+            {"$set": {"allowed": {"$lte": [{"$add": [{"$size": "$hits"}, count]}, limit]}}},
+            {"$set": {
+                "hits": {"$cond": ["$allowed", {"$concatArrays": ["$hits", [now] * count]}, "$hits"]},
+                "updated_at": now
+            }}
+        ],
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+    if not record["allowed"]:
+        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+
+
+async def _charge_local_bucket(email: str, count: int, limit: int):
+    today = str(date.today())
+    record_id = f"{email}_{today}"
+
+    bucket = local_buckets.get(record_id)
+    if bucket is None:
+        # First request from this user today on this worker: load the shared count
+        record = await database.ai_usage.find_one({"_id": record_id}, {"count": 1})
+        bucket = local_buckets.setdefault(record_id, {
             "email": email,
             "date": today,
-            "count": 1
+            "used": (record or {}).get("count", 0),
+            "pending": 0
         })
+
+    if bucket["used"] + count > limit:
+        raise HTTPException(status_code=429, detail="Daily limit exceeded")
+
+    bucket["used"] += count
+    bucket["pending"] += count
+
+
+async def sync_rate_limit_counters():
+    """Flush locally admitted generations to ai_usage and pick up other workers' usage"""
+    today = str(date.today())
+
+    for record_id, bucket in list(local_buckets.items()):
+        pending = bucket["pending"]
+        bucket["pending"] = 0
+        try:
+            record = await database.ai_usage.find_one_and_update(
+                {"_id": record_id},
+                {
+                    "$inc": {"count": pending},
+                    "$setOnInsert": {
+                        "email": bucket["email"],
+                        "date": bucket["date"],
+                        "created_at": datetime.utcnow()
+                    }
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except Exception as e:
+            bucket["pending"] += pending
+            print(f"Rate limit sync failed for {record_id}: {str(e)}")
+            continue
+
+        if bucket["date"] != today:
+            # Yesterday's counts are flushed, drop the bucket
+            local_buckets.pop(record_id, None)
+        else:
+            bucket["used"] = record["count"] + bucket["pending"]
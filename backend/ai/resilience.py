@@ -0,0 +1,222 @@
+import asyncio
+import contextlib
+import os
+import random
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+from dotenv import load_dotenv
+
+load_dotenv()
+
+T = TypeVar("T")
+
+# Resilience configuration for provider calls
+LLM_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "20"))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_RETRY_BASE_DELAY_MS = float(os.getenv("LLM_RETRY_BASE_DELAY_MS", "200"))
+LLM_RETRY_MAX_DELAY_MS = float(os.getenv("LLM_RETRY_MAX_DELAY_MS", "2000"))
+LLM_RETRY_BUDGET_RATIO = float(os.getenv("LLM_RETRY_BUDGET_RATIO", "0.2"))  # Retries allowed per request
+LLM_RETRY_BUDGET_MIN = float(os.getenv("LLM_RETRY_BUDGET_MIN", "10"))
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+LLM_HEDGE_DELAY_MS = float(os.getenv("LLM_HEDGE_DELAY_MS", "0"))  # 0 disables hedging
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and fails fast
+    for `reset_seconds`. Then lets a single trial call through
+    (half-open) and closes again if it succeeds.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    def before_call(self) -> None:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                self.rejected += 1
+                raise CircuitOpenError("LLM provider is unavailable, try again shortly")
+            self.state = "half_open"
+
+        if self.state == "half_open":
+            if self.trial_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError("LLM provider is unavailable, try again shortly")
+            self.trial_in_flight = True
+
+    def check(self) -> None:
+        """
+        Raise CircuitOpenError if a call made now would be rejected, without
+        taking the half-open trial. Lets a caller fail fast before committing
+        to a response (e.g. opening a stream).
+        """
+        cooling_down = self.state == "open" and time.monotonic() - self.opened_at < self.reset_seconds
+        if cooling_down or (self.state == "half_open" and self.trial_in_flight):
+            self.rejected += 1
+            raise CircuitOpenError("LLM provider is unavailable, try again shortly")
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Forget an abandoned half-open trial so the next call can try"""
+        self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self.trial_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected
+        }
+
+
+class RetryBudget:
+    """
+    Token bucket shared by all requests: each request deposits `ratio`
+    tokens and each retry or hedge spends one. During an outage retries
+    stay a small fraction of traffic instead of multiplying it.
+    """
+
+    def __init__(self, ratio: float, minimum: float):
+        self.ratio = ratio
+        self.capacity = max(minimum, 1)
+        self.tokens = self.capacity
+
+    def record_request(self) -> None:
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+breaker = CircuitBreaker(LLM_BREAKER_FAILURE_THRESHOLD, LLM_BREAKER_RESET_SECONDS)
+retry_budget = RetryBudget(LLM_RETRY_BUDGET_RATIO, LLM_RETRY_BUDGET_MIN)
+resilience_stats = {
+    "calls": 0,
+    "attempts": 0,
+    "retries": 0,
+    "timeouts": 0,
+    "hedges": 0,
+    "hedge_wins": 0,
+    "retry_budget_exhausted": 0
+}
+
+
+def _backoff_seconds(attempt: int) -> float:
+    """Full-jitter exponential backoff"""
+    cap = min(LLM_RETRY_MAX_DELAY_MS, LLM_RETRY_BASE_DELAY_MS * (2 ** attempt))
+    return random.uniform(0, cap) / 1000
+
+
+async def _hedged(make_call: Callable[[], Awaitable[T]]) -> T:
+    """Run the call, and if it is slow, race a second copy against it"""
+    primary = asyncio.ensure_future(make_call())
+    tasks = [primary]
+    try:
+        if LLM_HEDGE_DELAY_MS <= 0:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=LLM_HEDGE_DELAY_MS / 1000)
+        if done or not retry_budget.try_spend():
+            return await primary
+
+        resilience_stats["hedges"] += 1
+        hedge = asyncio.ensure_future(make_call())
+        tasks.append(hedge)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        resilience_stats["hedge_wins"] += 1
+                    return task.result()
+        # Both failed, surface the primary's error
+        return primary.result()
+    finally:
+        # Drop the loser (or everything, if we timed out)
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def call_with_resilience(
+    make_call: Callable[[], Awaitable[T]],
+    slots: Optional[asyncio.Semaphore] = None
+) -> T:
+    """
+    Call the provider with a per-attempt timeout, jittered retries limited by
+    the shared retry budget, the circuit breaker and optional hedging.
+
+    Each attempt first waits for one of `slots`, if given. Time spent queued
+    locally is not part of the attempt timeout and never counts as a provider
+    failure. A hedge shares its attempt's slot.
+    """
+    resilience_stats["calls"] += 1
+    retry_budget.record_request()
+
+    attempt = 0
+    while True:
+        async with slots or contextlib.nullcontext():
+            breaker.before_call()
+            resilience_stats["attempts"] += 1
+            try:
+                result = await asyncio.wait_for(_hedged(make_call), LLM_ATTEMPT_TIMEOUT_SECONDS)
+                breaker.record_success()
+                return result
+            except asyncio.TimeoutError:
+                resilience_stats["timeouts"] += 1
+                breaker.record_failure()
+                error = TimeoutError(f"LLM call timed out after {LLM_ATTEMPT_TIMEOUT_SECONDS}s")
+            except asyncio.CancelledError:
+                breaker.release_trial()
+                raise
+            except Exception as e:
+                breaker.record_failure()
+                error = e
+
+        attempt += 1
+        if attempt >= LLM_MAX_ATTEMPTS:
+            raise error
+        if not retry_budget.try_spend():
+            resilience_stats["retry_budget_exhausted"] += 1
+            raise error
+
+        resilience_stats["retries"] += 1
+        await asyncio.sleep(_backoff_seconds(attempt))
+
+
+def get_resilience_stats() -> dict:
+    """Breaker state and retry/hedge counters for monitoring"""
+    return {
+        "breaker": breaker.stats(),
+        "retry_budget_tokens": round(retry_budget.tokens, 2),
+        **resilience_stats
+    }
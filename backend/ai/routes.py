@@ -1,18 +1,68 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from auth.dependencies import get_current_user
+from typing import List, Optional
+import asyncio
+import json
+import os
+from auth.dependencies import get_current_user, get_ops_user
 from ai.prompts import build_prompt
-from ai.rate_limit import check_rate_limit
-from ai.service import generate_linkedin_post
+from ai.tokens import fit_topic, TopicTooLongError
+from ai.rate_limit import check_rate_limit, refund_rate_limit
+from ai.service import generate_linkedin_post, generation_in_flight, stream_linkedin_post, LLM_MODEL, LENGTH_TOKEN_BUDGETS, GROQ_MAX_CONCURRENCY, coalescing_stats
+from ai.cache import make_cache_key, get_cached_post, store_post, cache_stats
+from ai.resilience import CircuitOpenError, breaker, get_resilience_stats
 from db.mongodb import db
+from utils.pagination import paginate
+from utils.serialization import field_projection
+from posts.schemas import ScheduledPostOut, ScheduledPostPage
+from user_profile.preferences import load_preferences
 
 router = APIRouter(prefix = "/ai", tags = ["AI"])
 
+MAX_BATCH_SIZE = int(os.getenv("AI_MAX_BATCH_SIZE", "50"))
+# Defaults to the upstream slot count: a batch can fill every slot, and more would only queue
+BATCH_CONCURRENCY = int(os.getenv("AI_BATCH_CONCURRENCY", str(GROQ_MAX_CONCURRENCY)))
+
 class GenerateRequest(BaseModel):
     topic: str
     tone: str = "professional"
     hook: str = "question"
     cta: str = "comment"
+    length: Optional[str] = None  # short, medium or long; defaults to the user's preference
+    use_cache: bool = False  # Opt in to reusing a cached post (does not use quota)
+
+
+class BatchGenerateRequest(BaseModel):
+    items: List[GenerateRequest]
+
+
+def prepare_request(data: GenerateRequest, default_length: str) -> GenerateRequest:
+    """Fill in the post length and fit the topic into its token budget"""
+    length = data.length or default_length
+    if length not in LENGTH_TOKEN_BUDGETS:
+        if data.length:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid length, expected one of {list(LENGTH_TOKEN_BUDGETS)}"
+            )
+        length = "medium"
+
+    try:
+        topic = fit_topic(data.topic)
+    except TopicTooLongError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return data.model_copy(update={"topic": topic, "length": length})
+
+
+def response_parameters(data: GenerateRequest) -> dict:
+    return {
+        'tone': data.tone,
+        'hook': data.hook,
+        'cta': data.cta,
+        'length': data.length
+    }
 
 
 @router.post("/generate")
@@ -27,44 +77,245 @@ async def generate_post(
     high-quality LinkedIn posts tailored to the specified
     topic, tone, hook, and call-to-action.
     """
+    charged = joined = False
     try:
+        # Length comes from the request or the user's saved preference
+        prefs = await load_preferences(email)
+        data = prepare_request(data, prefs["default_length"])
+        cache_key = make_cache_key(data.topic, data.tone, data.hook, data.cta, data.length)
+
+        # Cached hits are served without touching the daily quota
+        if data.use_cache:
+            cached_content = await get_cached_post(cache_key)
+            if cached_content is not None:
+                return {
+                    'generated_post': cached_content,
+                    'model': LLM_MODEL,
+                    'cached': True,
+                    'parameters': response_parameters(data)
+                }
+
         # Check rate limiting
         await check_rate_limit(email)
+        charged = True
         
-        # Generate post using Groq API
-        generated_content = await generate_linkedin_post(
-            topic=data.topic,
-            tone=data.tone,
-            hook=data.hook,
-            cta=data.cta
-        )
+        # Generate post using Groq API, sharing the call with identical
+        # requests from this user that are already in flight
+        dedupe_key = f"{email}:{cache_key}"
+        joined = generation_in_flight(dedupe_key)
+        try:
+            generated_content = await generate_linkedin_post(
+                topic=data.topic,
+                tone=data.tone,
+                hook=data.hook,
+                cta=data.cta,
+                length=data.length,
+                dedupe_key=dedupe_key
+            )
+        finally:
+            # The shared call was charged to the request that started it
+            if joined:
+                await refund_rate_limit(email)
+        await store_post(cache_key, generated_content)
         
         return {
             'generated_post': generated_content,
-            'model': 'llama-3.3-70b-versatile',
-            'parameters': {
-                'tone': data.tone,
-                'hook': data.hook,
-                'cta': data.cta
-            }
+            'model': LLM_MODEL,
+            'cached': False,
+            'parameters': response_parameters(data)
         }
     
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        # Upstream is unhealthy, fail fast instead of waiting out a timeout.
+        # No call was made, so give the quota back.
+        if charged and not joined:
+            await refund_rate_limit(email)
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
+        # A failed generation does not count against the quota
+        if charged and not joined:
+            await refund_rate_limit(email)
         # Return error with details
-        from fastapi import HTTPException
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate post: {str(e)}"
         )
 
-@router.get("/scheduled")
-async def get_scheduled_posts(user: str = Depends(get_current_user)):
-    posts = await db.scheduled_posts.find(
-        {"user_email": user}
-    ).sort("scheduled_time", 1).to_list(100)
+@router.post("/generate/batch")
+async def generate_post_batch(
+    data: BatchGenerateRequest,
+    email: str = Depends(get_current_user)
+):
+    """
+    Generate several LinkedIn posts in one call.
+
+    Items run concurrently (up to AI_BATCH_CONCURRENCY at a time, within
+    the upstream limit), the quota for the whole batch is charged in one
+    operation, and results come back in input order. Invalid and failed items are reported per
+    item and do not use quota.
+    """
+    if not data.items:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(data.items) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large (max {MAX_BATCH_SIZE} items)"
+        )
 
-    for p in posts:
-        p["_id"] = str(p["_id"])
-        p["scheduled_time"] = p["scheduled_time"].isoformat()
+    prefs = await load_preferences(email)
+
+    # An invalid item fails on its own instead of failing the whole batch
+    items, invalid = [], {}
+    for index, item in enumerate(data.items):
+        try:
+            items.append(prepare_request(item, prefs["default_length"]))
+        except HTTPException as e:
+            items.append(None)
+            invalid[index] = e.detail
+
+    cache_keys = [
+        make_cache_key(item.topic, item.tone, item.hook, item.cta, item.length) if item else None
+        for item in items
+    ]
+
+    # Serve opted-in cache hits first, only the valid misses use quota
+    cached = await asyncio.gather(*(
+        get_cached_post(key) if item and item.use_cache else asyncio.sleep(0)
+        for item, key in zip(items, cache_keys)
+    ))
+    misses = [i for i, content in enumerate(cached) if content is None and i not in invalid]
+
+    # Charge every uncached item in one operation
+    if misses:
+        await check_rate_limit(email, count=len(misses))
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    def item_result(index: int, item: GenerateRequest, content: str, from_cache: bool):
+        return {
+            'index': index,
+            'status': 'ok',
+            'generated_post': content,
+            'cached': from_cache,
+            'parameters': response_parameters(item)
+        }
+
+    async def run_item(index: int, item: GenerateRequest):
+        if index in invalid:
+            return {'index': index, 'status': 'error', 'detail': invalid[index]}
+        if cached[index] is not None:
+            return item_result(index, item, cached[index], True)
+
+        async with semaphore:
+            try:
+                generated_content = await generate_linkedin_post(
+                    topic=item.topic,
+                    tone=item.tone,
+                    hook=item.hook,
+                    cta=item.cta,
+                    length=item.length
+                )
+                await store_post(cache_keys[index], generated_content)
+                return item_result(index, item, generated_content, False)
+            except Exception as e:
+                return {'index': index, 'status': 'error', 'detail': str(e)}
+
+    results = await asyncio.gather(
+        *(run_item(i, item) for i, item in enumerate(items))
+    )
+
+    failed = sum(1 for r in results if r['status'] == 'error')
+    # Invalid items were never charged
+    await refund_rate_limit(email, failed - len(invalid))
+
+    return {
+        'model': LLM_MODEL,
+        'succeeded': len(results) - failed,
+        'failed': failed,
+        'results': results
+    }
+
+
+@router.post("/generate/stream")
+async def generate_post_stream(
+    data: GenerateRequest,
+    email: str = Depends(get_current_user)
+):
+    """
+    Stream a generated LinkedIn post as Server-Sent Events.
+
+    Emits a "token" event per content delta, then a "done" event
+    with the full text and parameters (or an "error" event).
+    """
+    prefs = await load_preferences(email)
+    data = prepare_request(data, prefs["default_length"])
+
+    # Fail fast while upstream is unhealthy, and rate limit, before the
+    # stream opens so a 503 or 429 is a normal HTTP error
+    try:
+        breaker.check()
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    await check_rate_limit(email)
+
+    async def event_stream():
+        parts = []
+        try:
+            async for delta in stream_linkedin_post(
+                topic=data.topic,
+                tone=data.tone,
+                hook=data.hook,
+                cta=data.cta,
+                length=data.length
+            ):
+                parts.append(delta)
+                yield f"event: token\ndata: {json.dumps({'text': delta})}\n\n"
+
+            final = {
+                'generated_post': "".join(parts).strip(),
+                'model': LLM_MODEL,
+                'parameters': response_parameters(data)
+            }
+            yield f"event: done\ndata: {json.dumps(final)}\n\n"
+        except Exception as e:
+            # Nothing was delivered, so the generation does not count
+            if not parts:
+                await refund_rate_limit(email)
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/metrics")
+async def get_ai_metrics(email: str = Depends(get_ops_user)):
+    """Generation cache, request coalescing and provider resilience counters"""
+    return {
+        "cache": cache_stats(),
+        "coalescing": dict(coalescing_stats),
+        "resilience": get_resilience_stats()
+    }
+
+
+SCHEDULED_POST_FIELDS = set(ScheduledPostOut.model_fields) - {"id"}
+
+
+@router.get("/scheduled", response_model=ScheduledPostPage, response_model_exclude_unset=True)
+async def get_scheduled_posts(
+    user: str = Depends(get_current_user),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    posts, next_cursor = await paginate(
+        db.scheduled_posts, {"user_email": user}, "scheduled_time", 1,
+        limit=limit, cursor=cursor,
+        projection=field_projection(fields, SCHEDULED_POST_FIELDS, required=["scheduled_time"])
+    )
 
-    return posts
\ No newline at end of file
+    return {"items": posts, "next_cursor": next_cursor}
\ No newline at end of file
@@ -1,84 +1,187 @@
-from groq import Groq
+import asyncio
 import os
+from typing import AsyncIterator, Dict, Optional
 from dotenv import load_dotenv
 from ai.prompts import build_prompt
+from ai.providers import get_provider
+from ai.resilience import CircuitOpenError, breaker, call_with_resilience
 
 load_dotenv()
 
-# Initialize Groq client
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
 # Model configuration
-GROQ_MODEL = "llama-3.3-70b-versatile"  # Updated to current model
 DEFAULT_TEMPERATURE = 0.7
 MAX_TOKENS = 500
 
+# Completion budget per post length, shorter posts return sooner and cost less
+LENGTH_TOKEN_BUDGETS = {
+    "short": 180,
+    "medium": 320,
+    "long": MAX_TOKENS,
+}
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "10"))
+
+# Generation backend chosen by LLM_PROVIDER (Groq, or the local stub for offline runs)
+provider = get_provider()
+LLM_MODEL = provider.model
+
+# Bound on concurrent upstream calls, extra requests wait here instead of piling onto the provider
+upstream_semaphore = asyncio.Semaphore(GROQ_MAX_CONCURRENCY)
+
+# Single-flight registry: identical in-flight generations share one upstream call
+inflight_generations: Dict[str, asyncio.Task] = {}
+coalescing_stats = {"upstream_calls": 0, "coalesced": 0}
+
 
 async def generate_linkedin_post(
     topic: str,
     tone: str = "professional",
     hook: str = "question",
-    cta: str = "comment"
+    cta: str = "comment",
+    length: str = "medium",
+    dedupe_key: Optional[str] = None
 ) -> str:
     """
-    Generate a LinkedIn post using Groq's Llama model.
-    
+    Generate a LinkedIn post using the configured LLM provider.
+
     Args:
         topic: The main topic/subject of the post
         tone: Tone of the post (professional, casual, inspiring)
         hook: Hook style (question, stat, story)
         cta: Call-to-action type (comment, share, connect)
-    
+        length: Post length (short, medium, long), sets the token budget
+        dedupe_key: If set, concurrent calls with the same key share
+            one upstream call and all receive its result
+
     Returns:
         Generated LinkedIn post content as string
-    
+
     Raises:
         Exception: If API call fails or returns invalid response
     """
+    if dedupe_key is None:
+        return await _generate_once(topic, tone, hook, cta, length)
+
+    task = inflight_generations.get(dedupe_key)
+    if task is not None:
+        coalescing_stats["coalesced"] += 1
+    else:
+        # Run the call as its own task so one caller disconnecting
+        # does not cancel it for everyone else waiting on it
+        task = asyncio.ensure_future(_generate_once(topic, tone, hook, cta, length))
+        inflight_generations[dedupe_key] = task
+        task.add_done_callback(lambda _: inflight_generations.pop(dedupe_key, None))
+
+    return await asyncio.shield(task)
+
+
+def generation_in_flight(dedupe_key: str) -> bool:
+    """True if a call with this dedupe_key is running, so a new caller would join it"""
+    return dedupe_key in inflight_generations
+
+
+async def _generate_once(topic: str, tone: str, hook: str, cta: str, length: str) -> str:
+    """Make a single upstream generation call"""
+    coalescing_stats["upstream_calls"] += 1
     try:
         # Build prompts using existing prompt templates
-        system_prompt, user_prompt = build_prompt(topic, tone, hook, cta)
-        
-        # Make synchronous call to Groq API
-        # Note: Groq SDK doesn't have async support yet, but it's fast enough
-        response = client.chat.completions.create(
-            model=GROQ_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=DEFAULT_TEMPERATURE,
-            max_tokens=MAX_TOKENS,
-        )
-        
-        # Extract generated content
-        generated_content = response.choices[0].message.content
-        
-        if not generated_content:
-            raise ValueError("Generated content is empty")
-        
+        system_prompt, user_prompt = build_prompt(topic, tone, hook, cta, length)
+
+        async def attempt() -> str:
+            content = await provider.complete(
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=DEFAULT_TEMPERATURE,
+                max_tokens=token_budget(length),
+            )
+            if not content:
+                raise ValueError("Generated content is empty")
+            return content
+
+        # Timeouts, retries, circuit breaker and hedging around the provider.
+        # Each attempt holds an upstream slot, so a burst cannot exhaust the pool.
+        generated_content = await call_with_resilience(attempt, slots=upstream_semaphore)
+
         return generated_content.strip()
-    
+
+    except CircuitOpenError:
+        raise
     except Exception as e:
         # Log error and raise
         print(f"Error generating LinkedIn post: {str(e)}")
         raise Exception(f"Failed to generate post: {str(e)}")
 
 
-def test_groq_connection():
+async def stream_linkedin_post(
+    topic: str,
+    tone: str = "professional",
+    hook: str = "question",
+    cta: str = "comment",
+    length: str = "medium"
+) -> AsyncIterator[str]:
+    """
+    Stream a LinkedIn post from the provider token by token.
+
+    Takes the same arguments as generate_linkedin_post and yields
+    content deltas as the model produces them.
+    """
+    try:
+        system_prompt, user_prompt = build_prompt(topic, tone, hook, cta, length)
+
+        # Hold the upstream slot for the whole stream. Tokens cannot be retried
+        # once sent, so streams only go through the breaker, after the wait for a slot.
+        async with upstream_semaphore:
+            breaker.before_call()
+            try:
+                async for delta in provider.stream(
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    temperature=DEFAULT_TEMPERATURE,
+                    max_tokens=token_budget(length),
+                ):
+                    yield delta
+            except (asyncio.CancelledError, GeneratorExit):
+                breaker.release_trial()
+                raise
+            except Exception:
+                breaker.record_failure()
+                raise
+            breaker.record_success()
+
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        print(f"Error streaming LinkedIn post: {str(e)}")
+        raise Exception(f"Failed to generate post: {str(e)}")
+
+
+def token_budget(length: str) -> int:
+    """max_tokens for a post length, unknown lengths get the medium budget"""
+    return LENGTH_TOKEN_BUDGETS.get(length, LENGTH_TOKEN_BUDGETS["medium"])
+
+
+async def close_client():
+    """Close the provider's HTTP connection pool (call on shutdown)"""
+    await provider.close()
+
+
+async def test_groq_connection():
     """
-    Test function to verify Groq API connection.
+    Test function to verify the LLM provider connection.
     Returns True if connection is successful, False otherwise.
     """
     try:
-        response = client.chat.completions.create(
-            model=GROQ_MODEL,
+        await provider.complete(
             messages=[
                 {"role": "user", "content": "Say 'Hello World' in one word"}
             ],
+            temperature=DEFAULT_TEMPERATURE,
             max_tokens=10,
         )
         return True
     except Exception as e:
-        print(f"Groq connection test failed: {str(e)}")
+        print(f"{provider.name} connection test failed: {str(e)}")
         return False
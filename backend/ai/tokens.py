@@ -0,0 +1,49 @@
+import math
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Topics longer than this are trimmed (or rejected) before reaching the provider
+MAX_TOPIC_TOKENS = int(os.getenv("MAX_TOPIC_TOKENS", "150"))
+TOPIC_OVERFLOW = os.getenv("TOPIC_OVERFLOW", "trim")  # "trim" or "reject"
+
+
+class TopicTooLongError(ValueError):
+    """Raised when a topic is over budget and TOPIC_OVERFLOW is "reject" """
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap local token estimate, no tokenizer needed.
+    Takes the larger of ~4 characters per token and ~0.75 words per token,
+    which errs on the high side for English prose.
+    """
+    if not text:
+        return 0
+    return max(math.ceil(len(text) / 4), math.ceil(len(text.split()) * 4 / 3))
+
+
+def fit_topic(topic: str, max_tokens: int = MAX_TOPIC_TOKENS) -> str:
+    """Return the topic trimmed to fit max_tokens, or raise if trimming is disabled"""
+    topic = topic.strip()
+    if estimate_tokens(topic) <= max_tokens:
+        return topic
+
+    if TOPIC_OVERFLOW == "reject":
+        raise TopicTooLongError(
+            f"Topic is too long (about {estimate_tokens(topic)} tokens, max {max_tokens})"
+        )
+
+    # Keep whole words while both estimates stay within budget
+    kept = []
+    chars = 0
+    for word in topic.split():
+        next_chars = chars + len(word) + (1 if kept else 0)
+        if max(math.ceil(next_chars / 4), math.ceil((len(kept) + 1) * 4 / 3)) > max_tokens:
+            break
+        kept.append(word)
+        chars = next_chars
+
+    # A single huge "word" still gets cut by characters
+    return " ".join(kept) if kept else topic[:max_tokens * 4]
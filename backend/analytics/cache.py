@@ -0,0 +1,109 @@
+"""
+Per-user cache for analytics responses.
+
+Entries are keyed by the user's analytics version, which every post and
+engagement write bumps (through the rollup updates), so a write makes all of
+the user's cached responses unreachable at once. Entries also expire after
+ANALYTICS_CACHE_TTL_SECONDS, which bounds staleness for the few inputs that
+do not bump the version (e.g. scheduled post status changes).
+
+With ANALYTICS_CACHE_SHARED=true the versions and responses also live in
+MongoDB, so invalidation and hits are shared by every worker.
+"""
+import itertools
+import os
+from datetime import datetime, timedelta
+from typing import Any, Optional
+from dotenv import load_dotenv
+from db.mongodb import database
+from utils.lru_cache import TTLCache
+
+load_dotenv()
+
+ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "5000"))
+ANALYTICS_CACHE_TTL_SECONDS = int(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "60"))
+ANALYTICS_CACHE_SHARED = os.getenv("ANALYTICS_CACHE_SHARED", "false").lower() == "true"
+
+local_cache = TTLCache(ANALYTICS_CACHE_MAX_ENTRIES, ANALYTICS_CACHE_TTL_SECONDS)
+
+# In-process versions. A forgotten (evicted) user gets a fresh value from the
+# counter, never an old one, so stale entries can never be hit again.
+local_versions = TTLCache(ANALYTICS_CACHE_MAX_ENTRIES, ANALYTICS_CACHE_TTL_SECONDS * 2)
+version_counter = itertools.count(1)
+
+# Counters for the optional MongoDB tier
+shared_stats = {"hits": 0, "misses": 0}
+
+
+async def _version(user_email: str) -> str:
+    if ANALYTICS_CACHE_SHARED:
+        record = await database.analytics_cache_versions.find_one({"_id": user_email})
+        return f"s{record['version'] if record else 0}"
+
+    version = local_versions.get(user_email)
+    if version is None:
+        version = f"l{next(version_counter)}"
+        local_versions.set(user_email, version)
+    return version
+
+
+async def cache_key(user_email: str, view: str) -> str:
+    """
+    Key for one analytics view (e.g. "overview:30") at the user's current
+    version. Take it before computing a response and store under the same
+    key, so a write that lands meanwhile cannot be hidden by the result.
+    """
+    return f"{user_email}:{await _version(user_email)}:{view}"
+
+
+async def get_cached(key: str) -> Optional[Any]:
+    """Cached response for a key from cache_key(), if any"""
+    value = local_cache.get(key)
+    if value is not None or not ANALYTICS_CACHE_SHARED:
+        return value
+
+    record = await database.analytics_cache.find_one({
+        "_id": key,
+        "expires_at": {"$gt": datetime.utcnow()}
+    })
+    if not record:
+        shared_stats["misses"] += 1
+        return None
+
+    shared_stats["hits"] += 1
+    local_cache.set(key, record["value"])
+    return record["value"]
+
+
+async def store(key: str, value: Any) -> None:
+    local_cache.set(key, value)
+
+    if ANALYTICS_CACHE_SHARED:
+        await database.analytics_cache.update_one(
+            {"_id": key},
+            {"$set": {
+                "value": value,
+                "expires_at": datetime.utcnow() + timedelta(seconds=ANALYTICS_CACHE_TTL_SECONDS)
+            }},
+            upsert=True
+        )
+
+
+async def invalidate(user_email: str) -> None:
+    """Make every cached analytics response of the user stale"""
+    if ANALYTICS_CACHE_SHARED:
+        await database.analytics_cache_versions.update_one(
+            {"_id": user_email},
+            {"$inc": {"version": 1}},
+            upsert=True
+        )
+    else:
+        local_versions.delete(user_email)
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters for both cache tiers"""
+    return {
+        "local": local_cache.stats(),
+        "shared": {"enabled": ANALYTICS_CACHE_SHARED, **shared_stats}
+    }
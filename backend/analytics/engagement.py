@@ -0,0 +1,78 @@
+from typing import Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+from analytics.rollups import COUNTERS, record_delta
+from db.mongodb import database
+
+# Weighted engagement score (out of 10)
+# Formula: (views * 0.1 + clicks * 0.5 + shares * 2) normalized to 0-10, capped at 10
+SCORE_WEIGHTS = {"views": 0.1, "clicks": 0.5, "shares": 2}
+
+# The same formula as an aggregation expression, so the database computes the
+# score from the counters it has just incremented
+ENGAGEMENT_SCORE_EXPR = {"$min": [
+    {"$round": [
+        {"$divide": [
+            {"$add": [
+                {"$multiply": [{"$ifNull": [f"${counter}", 0]}, weight]}
+                for counter, weight in SCORE_WEIGHTS.items()
+            ]},
+            10
+        ]},
+        2
+    ]},
+    10.0
+]}
+
+
+def engagement_score(views: int = 0, clicks: int = 0, shares: int = 0) -> float:
+    """Python version of ENGAGEMENT_SCORE_EXPR"""
+    raw_score = (views * SCORE_WEIGHTS["views"]) + (clicks * SCORE_WEIGHTS["clicks"]) + (shares * SCORE_WEIGHTS["shares"])
+    return min(round(raw_score / 10, 2), 10.0)
+
+
+def engagement_update(increments: dict) -> list:
+    """Update pipeline that adds to the counters and recomputes engagement_score"""
+    return [
+        {"$set": {
+            counter: {"$add": [{"$ifNull": [f"${counter}", 0]}, count]}
+            for counter, count in increments.items()
+        }},
+        {"$set": {"engagement_score": ENGAGEMENT_SCORE_EXPR}},
+    ]
+
+
+def apply_increments(post: dict, increments: dict) -> dict:
+    """The post as engagement_update leaves it, for working out rollup changes"""
+    after = {**post}
+    for counter, count in increments.items():
+        after[counter] = (post.get(counter) or 0) + count
+    after["engagement_score"] = engagement_score(*(after.get(counter) or 0 for counter in COUNTERS))
+    return after
+
+
+def rollup_delta(before: dict, increments: dict) -> dict:
+    """Rollup change for a post that received `increments`, given its state before"""
+    counts = {counter: (before.get(counter) or 0) + increments.get(counter, 0) for counter in COUNTERS}
+    return {
+        **increments,
+        "score_sum": engagement_score(**counts) - (before.get("engagement_score") or 0)
+    }
+
+
+async def track_engagement(post_id: str, user: str, increments: dict) -> Optional[dict]:
+    """
+    Add view/click/share counts to a post and recompute its engagement score
+    in one atomic round trip, so concurrent events can never leave the score
+    out of step with the counters. Returns the post as it was before the
+    update, or None if the user has no such post.
+    """
+    before = await database.posts.find_one_and_update(
+        {"_id": ObjectId(post_id), "user_email": user},
+        engagement_update(increments),
+        projection={"user_email": 1, "created_at": 1, "engagement_score": 1, **{c: 1 for c in COUNTERS}},
+        return_document=ReturnDocument.BEFORE
+    )
+    if before:
+        await record_delta(before["user_email"], before["created_at"], rollup_delta(before, increments))
+    return before
@@ -0,0 +1,151 @@
+"""
+Write-behind buffer for engagement events.
+
+/analytics/events adds view/click/share events to an in-process buffer that
+coalesces them into per-post increments. The buffer is flushed with one
+bulk_write when it reaches ANALYTICS_FLUSH_SIZE posts, every
+ANALYTICS_FLUSH_SECONDS from the scheduler, and on shutdown. Events that
+arrive while the buffer is full are dropped and counted.
+"""
+import asyncio
+import os
+import time
+from typing import Dict, Iterable, Tuple
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from analytics.engagement import apply_increments, engagement_update
+from analytics.rollups import COUNTERS, record_changes
+from db.mongodb import database
+
+load_dotenv()
+
+ANALYTICS_FLUSH_SECONDS = float(os.getenv("ANALYTICS_FLUSH_SECONDS", "5"))
+ANALYTICS_FLUSH_SIZE = int(os.getenv("ANALYTICS_FLUSH_SIZE", "1000"))  # Buffered posts that trigger a flush
+ANALYTICS_BUFFER_MAX_POSTS = int(os.getenv("ANALYTICS_BUFFER_MAX_POSTS", "50000"))
+
+EVENT_COUNTERS = {"view": "views", "click": "clicks", "share": "shares"}
+
+
+class EventBuffer:
+    """Per-post counter increments waiting to be written"""
+
+    def __init__(self, flush_size: int, max_posts: int):
+        self.flush_size = flush_size
+        self.max_posts = max_posts
+        self.pending: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self.flush_lock = asyncio.Lock()
+        self.stats = {
+            "events_accepted": 0,
+            "events_dropped": 0,
+            "events_flushed": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0
+        }
+
+    def add(self, user: str, post_id: str, counter: str, count: int = 1) -> bool:
+        """Buffer an event; returns False if it was dropped because the buffer is full"""
+        key = (user, post_id)
+        increments = self.pending.get(key)
+        if increments is None:
+            if len(self.pending) >= self.max_posts:
+                self.stats["events_dropped"] += count
+                return False
+            increments = self.pending[key] = {}
+        increments[counter] = increments.get(counter, 0) + count
+        self.stats["events_accepted"] += count
+        return True
+
+    def should_flush(self) -> bool:
+        return len(self.pending) >= self.flush_size and not self.flush_lock.locked()
+
+    def _restore(self, batch: Iterable[Tuple[Tuple[str, str], Dict[str, int]]]) -> None:
+        """Put a batch that failed to write back in front of newer events"""
+        for (user, post_id), increments in batch:
+            for counter, count in increments.items():
+                if self.add(user, post_id, counter, count):
+                    # Already counted when first accepted
+                    self.stats["events_accepted"] -= count
+
+    async def flush(self) -> int:
+        """Write all buffered increments; returns the number of events written"""
+        async with self.flush_lock:
+            if not self.pending:
+                return 0
+
+            batch, self.pending = self.pending, {}
+            keys = list(batch)
+            started = time.perf_counter()
+            try:
+                # Scores are recomputed server side; read the posts first so
+                # the rollups can get the same change as a delta
+                before = await load_posts(keys)
+                await database.posts.bulk_write([
+                    UpdateOne(
+                        {"_id": ObjectId(post_id), "user_email": user},
+                        engagement_update(batch[(user, post_id)])
+                    )
+                    for user, post_id in keys
+                ], ordered=False)
+            except BulkWriteError as e:
+                # Unordered: every update not listed in writeErrors was applied,
+                # so only the failed ones go back in the buffer
+                failed = {keys[error["index"]] for error in e.details.get("writeErrors", [])}
+                self.stats["flush_errors"] += 1
+                print(f"Engagement event flush failed for {len(failed)} posts: {str(e)}")
+                self._restore((key, batch[key]) for key in failed)
+                batch = {key: increments for key, increments in batch.items() if key not in failed}
+            except Exception as e:
+                self.stats["flush_errors"] += 1
+                print(f"Engagement event flush failed: {str(e)}")
+                self._restore(batch.items())
+                return 0
+
+            written = sum(sum(increments.values()) for increments in batch.values())
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.stats["flushes"] += 1
+            self.stats["events_flushed"] += written
+            self.stats["last_flush_ms"] = round(elapsed_ms, 2)
+            self.stats["max_flush_ms"] = round(max(self.stats["max_flush_ms"], elapsed_ms), 2)
+
+        try:
+            await record_changes(
+                (before[key], apply_increments(before[key], increments))
+                for key, increments in batch.items() if key in before
+            )
+        except Exception as e:
+            print(f"Rollup update after event flush failed: {str(e)}")
+        return written
+
+    def metrics(self) -> dict:
+        return {
+            "buffered_posts": len(self.pending),
+            "buffered_events": sum(sum(i.values()) for i in self.pending.values()),
+            "flush_size": self.flush_size,
+            "max_posts": self.max_posts,
+            **self.stats
+        }
+
+
+async def load_posts(keys: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], dict]:
+    """The posts behind (user, post_id) keys, with the fields their rollups use"""
+    keys = set(keys)
+    projection = {"user_email": 1, "created_at": 1, "tone": 1, "is_favorite": 1,
+                  "engagement_score": 1, **{c: 1 for c in COUNTERS}}
+    posts = {}
+    async for post in database.posts.find({"_id": {"$in": [ObjectId(post_id) for _, post_id in keys]}}, projection):
+        key = (post["user_email"], str(post["_id"]))
+        if key in keys:
+            posts[key] = post
+    return posts
+
+
+event_buffer = EventBuffer(ANALYTICS_FLUSH_SIZE, ANALYTICS_BUFFER_MAX_POSTS)
+
+
+async def flush_events() -> int:
+    """Flush the buffer (scheduled job and shutdown hook)"""
+    return await event_buffer.flush()
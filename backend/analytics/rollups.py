@@ -0,0 +1,165 @@
+"""
+Daily analytics rollups.
+
+analytics_daily holds one document per user and UTC day (the day a post was
+created) with running totals for that day's posts:
+
+    {"user_email", "date": "YYYY-MM-DD", "posts", "views", "clicks", "shares",
+     "score_sum", "favorites", "tones": {tone: count}}
+
+The post and engagement write paths keep it up to date with $inc deltas, so
+analytics reads cost one document per day instead of one per post. The
+updates are not transactional with the post writes; rebuild to correct any
+drift:
+
+    python -m analytics.rollups --rebuild [--user EMAIL]
+"""
+import asyncio
+import sys
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+from analytics.cache import invalidate as invalidate_analytics
+from db.mongodb import database
+
+COUNTERS = ("views", "clicks", "shares")
+
+
+def day_key(created_at: datetime) -> str:
+    """UTC day a post belongs to, matching $dateToString's %Y-%m-%d"""
+    return created_at.strftime("%Y-%m-%d")
+
+
+def tone_key(tone: Optional[str]) -> str:
+    """Tone as a safe field name under `tones` (no path separators or operators)"""
+    return (tone or "unknown").replace(".", "_").lstrip("$") or "unknown"
+
+
+def contribution(post: Optional[dict]) -> dict:
+    """What one post adds to its day's rollup"""
+    if not post:
+        return {}
+    values = {
+        "posts": 1,
+        "score_sum": post.get("engagement_score") or 0,
+        "favorites": 1 if post.get("is_favorite") else 0,
+        f"tones.{tone_key(post.get('tone'))}": 1,
+    }
+    for counter in COUNTERS:
+        values[counter] = post.get(counter) or 0
+    return values
+
+
+def _update(user_email: str, date: str, delta: dict) -> Optional[UpdateOne]:
+    changes = {field: value for field, value in delta.items() if value}
+    if not changes:
+        return None
+    return UpdateOne({"user_email": user_email, "date": date}, {"$inc": changes}, upsert=True)
+
+
+async def record_delta(user_email: str, created_at: datetime, delta: dict) -> None:
+    """Add a delta (e.g. {"views": 1, "score_sum": 0.1}) to a post's day"""
+    update = _update(user_email, day_key(created_at), delta)
+    if update:
+        await database.analytics_daily.bulk_write([update])
+        await invalidate_analytics(user_email)
+
+
+async def record_changes(changes: Iterable[Tuple[Optional[dict], Optional[dict]]]) -> None:
+    """
+    Apply (before, after) post versions to the rollups in one bulk write.
+    Use (None, post) for a new post and (post, None) for a deleted one.
+    """
+    deltas = {}
+    for before, after in changes:
+        post = after or before
+        if not post:
+            continue
+        delta = deltas.setdefault((post["user_email"], day_key(post["created_at"])), {})
+        for field, value in contribution(after).items():
+            delta[field] = delta.get(field, 0) + value
+        for field, value in contribution(before).items():
+            delta[field] = delta.get(field, 0) - value
+
+    updates = [_update(user, date, delta) for (user, date), delta in deltas.items()]
+    updates = [u for u in updates if u]
+    if updates:
+        await database.analytics_daily.bulk_write(updates, ordered=False)
+        for user in {user for user, _ in deltas}:
+            await invalidate_analytics(user)
+
+
+async def record_change(before: Optional[dict], after: Optional[dict]) -> None:
+    await record_changes([(before, after)])
+
+
+async def _day_totals(query: dict) -> dict:
+    """Rollup documents' totals keyed by (user, date) for the posts matching query"""
+    projection = {"user_email": 1, "created_at": 1, "tone": 1, "is_favorite": 1,
+                  "engagement_score": 1, **{c: 1 for c in COUNTERS}}
+
+    days = {}
+    async for post in database.posts.find(query, projection).batch_size(1000):
+        key = (post["user_email"], day_key(post["created_at"]))
+        totals = days.setdefault(key, {"posts": 0, "score_sum": 0, "favorites": 0, "tones": {},
+                                       **{c: 0 for c in COUNTERS}})
+        for field, value in contribution(post).items():
+            if field.startswith("tones."):
+                tone = field[len("tones."):]
+                totals["tones"][tone] = totals["tones"].get(tone, 0) + value
+            else:
+                totals[field] += value
+    return days
+
+
+async def _rebuild_user(user_email: str) -> int:
+    """Replace one user's rollups with totals recomputed from their posts"""
+    # Days that existed before the scan; ones created meanwhile belong to new posts
+    previous = {day["date"] async for day in database.analytics_daily.find({"user_email": user_email}, {"date": 1})}
+    days = await _day_totals({"user_email": user_email})
+
+    requests = [
+        ReplaceOne({"user_email": user, "date": date}, {"user_email": user, "date": date, **totals}, upsert=True)
+        for (user, date), totals in days.items()
+    ]
+    stale = previous - {date for _, date in days}
+    if stale:
+        requests.append(DeleteMany({"user_email": user_email, "date": {"$in": sorted(stale)}}))
+    for i in range(0, len(requests), 1000):
+        await database.analytics_daily.bulk_write(requests[i:i + 1000], ordered=False)
+    await invalidate_analytics(user_email)
+    return len(days)
+
+
+async def rebuild_rollups(user_email: Optional[str] = None) -> int:
+    """
+    Recompute rollups from the posts collection, one user at a time; returns
+    the number of day documents. Safe while the app is writing: each day is
+    replaced in place, so it never goes missing and concurrent upserts cannot
+    collide with it. A delta that lands on a day between the user's scan and
+    the replace can still be lost or counted twice; rebuilding a user again
+    at a quiet time corrects it.
+    """
+    if user_email:
+        users = [user_email]
+    else:
+        users = set(await database.posts.distinct("user_email"))
+        users.update(await database.analytics_daily.distinct("user_email"))
+
+    count = 0
+    for user in sorted(users):
+        count += await _rebuild_user(user)
+    return count
+
+
+async def main(user_email: Optional[str]):
+    count = await rebuild_rollups(user_email)
+    print(f"Rebuilt {count} daily rollups")
+
+
+if __name__ == "__main__":
+    if "--rebuild" not in sys.argv:
+        print("Usage: python -m analytics.rollups --rebuild [--user EMAIL]")
+        sys.exit(2)
+    user = sys.argv[sys.argv.index("--user") + 1] if "--user" in sys.argv else None
+    asyncio.run(main(user))
@@ -1,62 +1,141 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from datetime import datetime, timedelta
-from auth.dependencies import get_current_user
+import asyncio
+import os
+from auth.dependencies import get_current_user, get_ops_user
 from db.mongodb import database
 from bson import ObjectId
-from typing import Optional
+from typing import List, Optional
+from analytics.schemas import AnalyticsOverview, DashboardStats, EngagementEvent, PostEngagement
+from analytics.rollups import day_key
+from analytics.engagement import track_engagement
+from analytics.events import EVENT_COUNTERS, event_buffer, flush_events
+from analytics import cache as analytics_cache
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
+# Days of daily post counts shown as recent activity on the dashboard
+RECENT_ACTIVITY_DAYS = 7
 
-@router.get("/dashboard")
+MAX_EVENTS_PER_REQUEST = int(os.getenv("ANALYTICS_MAX_EVENTS_PER_REQUEST", "1000"))
+
+
+@router.get("/dashboard", response_model=DashboardStats)
 async def dashboard(current_user: str = Depends(get_current_user)):
-    # Total posts
-    total_posts = await database.posts.count_documents({"user_email": current_user})
-
-    # Average engagement score
-    avg_cursor = database.posts.aggregate([
-        {"$match": {"user_email": current_user}},
-        {"$group": {"_id": None, "avg": {"$avg": "$engagement_score"}}}
-    ])
-    avg_result = await avg_cursor.to_list(1)
-    avg_engagement_score = avg_result[0]["avg"] if avg_result else 0
-
-    # Top tone
-    tone_cursor = database.posts.aggregate([
-        {"$match": {"user_email": current_user}},
-        {"$group": {"_id": "$tone", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 1}
-    ])
-    tone_result = await tone_cursor.to_list(1)
-    top_tone = tone_result[0]["_id"] if tone_result else None
-
-    return {
+    """Headline numbers, tone breakdown and recent activity for the dashboard"""
+    cache_key = await analytics_cache.cache_key(current_user, "dashboard")
+    cached = await analytics_cache.get_cached(cache_key)
+    if cached is not None:
+        return cached
+
+    recent_since = day_key(datetime.utcnow() - timedelta(days=RECENT_ACTIVITY_DAYS - 1))
+
+    # Every post metric comes from one pass over the user's daily rollups
+    rollup_pipeline = [
+        {"$match": {"user_email": current_user, "posts": {"$gt": 0}}},
+        {"$facet": {
+            "totals": [
+                {"$group": {
+                    "_id": None,
+                    "total_posts": {"$sum": "$posts"},
+                    "score": {"$sum": "$score_sum"},
+                    "favorites": {"$sum": "$favorites"}
+                }}
+            ],
+            "tones": [
+                {"$project": {"tones": {"$objectToArray": "$tones"}}},
+                {"$unwind": "$tones"},
+                {"$group": {"_id": "$tones.k", "count": {"$sum": "$tones.v"}}},
+                {"$match": {"count": {"$gt": 0}}},
+                {"$sort": {"count": -1, "_id": 1}}
+            ],
+            "recent": [
+                {"$match": {"date": {"$gte": recent_since}}},
+                {"$project": {"_id": "$date", "posts": 1}},
+                {"$sort": {"_id": 1}}
+            ]
+        }}
+    ]
+
+    # The scheduled post and template counts are independent, so run them alongside
+    facet_result, scheduled_result, total_templates = await asyncio.gather(
+        database.analytics_daily.aggregate(rollup_pipeline).to_list(1),
+        database.scheduled_posts.aggregate([
+            {"$match": {"user_email": current_user}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]).to_list(None),
+        database.templates.count_documents({"user_email": current_user})
+    )
+
+    facets = facet_result[0] if facet_result else {"totals": [], "tones": [], "recent": []}
+    totals = facets["totals"][0] if facets["totals"] else {"total_posts": 0, "score": 0, "favorites": 0}
+    total_posts = totals["total_posts"]
+
+    stats = {
         "total_posts": total_posts,
-        "average_engagement": round(avg_engagement_score, 2),
-        "top_tone": top_tone
+        "average_engagement": round(totals["score"] / total_posts, 2) if total_posts else 0,
+        "top_tone": facets["tones"][0]["_id"] if facets["tones"] else None,
+        "tone_breakdown": [{"tone": t["_id"], "count": t["count"]} for t in facets["tones"]],
+        "favorite_posts": totals["favorites"],
+        "favorite_ratio": round(totals["favorites"] / total_posts, 2) if total_posts else 0,
+        "recent_activity": [{"date": d["_id"], "posts": d["posts"]} for d in facets["recent"]],
+        "scheduled_posts": {s["_id"]: s["count"] for s in scheduled_result},
+        "total_templates": total_templates
     }
+    await analytics_cache.store(cache_key, stats)
+    return stats
 
 
-@router.get("/overview")
+@router.get("/overview", response_model=AnalyticsOverview)
 async def get_analytics_overview(
     days: Optional[int] = 30,
     user: str = Depends(get_current_user)
 ):
     """Get overall analytics for user's posts"""
     try:
+        cache_key = await analytics_cache.cache_key(user, f"overview:{days}")
+        cached = await analytics_cache.get_cached(cache_key)
+        if cached is not None:
+            return cached
+
         # Calculate date range
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        # Get all user posts in date range
-        posts = await database.posts.find({
-            "user_email": user,
-            "created_at": {"$gte": start_date, "$lte": end_date}
-        }).to_list(1000)
+        # Sum the daily rollups in the window; cost depends on days, not posts
+        pipeline = [
+            {"$match": {
+                "user_email": user,
+                "date": {"$gte": day_key(start_date), "$lte": day_key(end_date)},
+                "posts": {"$gt": 0}
+            }},
+            {"$sort": {"date": 1}},
+            {"$group": {
+                "_id": None,
+                "total_posts": {"$sum": "$posts"},
+                "score": {"$sum": "$score_sum"},
+                "total_views": {"$sum": "$views"},
+                "total_clicks": {"$sum": "$clicks"},
+                "total_shares": {"$sum": "$shares"},
+                "engagement_trend": {"$push": {
+                    "date": "$date",
+                    "score": {"$divide": ["$score_sum", "$posts"]}
+                }}
+            }},
+            {"$project": {
+                "_id": 0,
+                "total_posts": 1,
+                "avg_engagement": {"$divide": ["$score", "$total_posts"]},
+                "total_views": 1,
+                "total_clicks": 1,
+                "total_shares": 1,
+                "engagement_trend": 1
+            }}
+        ]
+        result = await database.analytics_daily.aggregate(pipeline).to_list(1)
         
-        if not posts:
-            return {
+        if not result:
+            overview = {
                 "total_posts": 0,
                 "avg_engagement": 0,
                 "total_views": 0,
@@ -64,44 +143,20 @@ async def get_analytics_overview(
                 "total_shares": 0,
                 "engagement_trend": []
             }
+        else:
+            # Round the (one per day) averages here so they match Python's round()
+            overview = result[0]
+            overview["avg_engagement"] = round(overview["avg_engagement"], 2)
+            for day in overview["engagement_trend"]:
+                day["score"] = round(day["score"], 2)
         
-        # Calculate aggregates
-        total_posts = len(posts)
-        total_views = sum(post.get("views", 0) for post in posts)
-        total_clicks = sum(post.get("clicks", 0) for post in posts)
-        total_shares = sum(post.get("shares", 0) for post in posts)
-        
-        # Calculate average engagement (normalized score)
-        engagement_scores = [post.get("engagement_score", 0) for post in posts]
-        avg_engagement = sum(engagement_scores) / len(engagement_scores) if engagement_scores else 0
-        
-        # Build engagement trend (group by day)
-        trend_data = {}
-        for post in posts:
-            date_key = post["created_at"].date().isoformat()
-            if date_key not in trend_data:
-                trend_data[date_key] = {"date": date_key, "score": 0, "count": 0}
-            trend_data[date_key]["score"] += post.get("engagement_score", 0)
-            trend_data[date_key]["count"] += 1
-        
-        engagement_trend = [
-            {"date": v["date"], "score": round(v["score"] / v["count"], 2)}
-            for v in sorted(trend_data.values(), key=lambda x: x["date"])
-        ]
-        
-        return {
-            "total_posts": total_posts,
-            "avg_engagement": round(avg_engagement, 2),
-            "total_views": total_views,
-            "total_clicks": total_clicks,
-            "total_shares": total_shares,
-            "engagement_trend": engagement_trend
-        }
+        await analytics_cache.store(cache_key, overview)
+        return overview
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching analytics: {str(e)}")
 
 
-@router.get("/posts/{post_id}/engagement")
+@router.get("/posts/{post_id}/engagement", response_model=PostEngagement)
 async def get_post_engagement(
     post_id: str,
     user: str = Depends(get_current_user)
@@ -111,7 +166,7 @@ async def get_post_engagement(
         post = await database.posts.find_one({
             "_id": ObjectId(post_id),
             "user_email": user
-        })
+        }, {"views": 1, "clicks": 1, "shares": 1, "engagement_score": 1})
         
         if not post:
             raise HTTPException(status_code=404, detail="Post not found")
@@ -136,17 +191,12 @@ async def track_post_view(
 ):
     """Track a view for a post"""
     try:
-        result = await database.posts.update_one(
-            {"_id": ObjectId(post_id), "user_email": user},
-            {"$inc": {"views": 1}}
-        )
+        # Count the view and recompute the engagement score atomically
+        post = await track_engagement(post_id, user, {"views": 1})
         
-        if result.modified_count == 0:
+        if not post:
             raise HTTPException(status_code=404, detail="Post not found")
         
-        # Recalculate engagement score
-        await recalculate_engagement_score(post_id)
-        
         return {"message": "View tracked successfully"}
     except HTTPException:
         raise
@@ -161,18 +211,15 @@ async def track_post_click(
 ):
     """Track a click for a post"""
     try:
-        result = await database.posts.update_one(
-            {"_id": ObjectId(post_id), "user_email": user},
-            {"$inc": {"clicks": 1}}
-        )
+        # Count the click and recompute the engagement score atomically
+        post = await track_engagement(post_id, user, {"clicks": 1})
         
-        if result.modified_count == 0:
+        if not post:
             raise HTTPException(status_code=404, detail="Post not found")
         
-        # Recalculate engagement score
-        await recalculate_engagement_score(post_id)
-        
         return {"message": "Click tracked successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error tracking click: {str(e)}")
 
@@ -184,17 +231,12 @@ async def track_post_share(
 ):
     """Track a share for a post"""
     try:
-        result = await database.posts.update_one(
-            {"_id": ObjectId(post_id), "user_email": user},
-            {"$inc": {"shares": 1}}
-        )
+        # Count the share and recompute the engagement score atomically
+        post = await track_engagement(post_id, user, {"shares": 1})
         
-        if result.modified_count == 0:
+        if not post:
             raise HTTPException(status_code=404, detail="Post not found")
         
-        # Recalculate engagement score
-        await recalculate_engagement_score(post_id)
-        
         return {"message": "Share tracked successfully"}
     except HTTPException:
         raise
@@ -202,23 +244,38 @@ async def track_post_share(
         raise HTTPException(status_code=400, detail=f"Error tracking share: {str(e)}")
 
 
-async def recalculate_engagement_score(post_id: str):
-    """Recalculate engagement score based on views, clicks, and shares"""
-    post = await database.posts.find_one({"_id": ObjectId(post_id)})
-    
-    if not post:
-        return
-    
-    views = post.get("views", 0)
-    clicks = post.get("clicks", 0)
-    shares = post.get("shares", 0)
-    
-    # Weighted engagement score (out of 10)
-    # Formula: (views * 0.1 + clicks * 0.5 + shares * 2) normalized to 0-10
-    raw_score = (views * 0.1) + (clicks * 0.5) + (shares * 2)
-    engagement_score = min(round(raw_score / 10, 2), 10.0)  # Cap at 10
-    
-    await database.posts.update_one(
-        {"_id": ObjectId(post_id)},
-        {"$set": {"engagement_score": engagement_score}}
-    )
\ No newline at end of file
+@router.post("/events", status_code=202)
+async def ingest_events(
+    events: List[EngagementEvent],
+    background_tasks: BackgroundTasks,
+    user: str = Depends(get_current_user)
+):
+    """
+    Record a batch of view/click/share events.
+
+    Events are buffered and written in bulk a few seconds later, so counts
+    and scores catch up shortly after this returns. Events for posts the
+    user does not own are ignored when the buffer is written.
+    """
+    if len(events) > MAX_EVENTS_PER_REQUEST:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_EVENTS_PER_REQUEST} events per request"
+        )
+
+    accepted = 0
+    for event in events:
+        if event_buffer.add(user, event.post_id, EVENT_COUNTERS[event.type]):
+            accepted += 1
+
+    # Flush early once enough posts are waiting, after the response is sent
+    if event_buffer.should_flush():
+        background_tasks.add_task(flush_events)
+
+    return {"accepted": accepted, "dropped": len(events) - accepted}
+
+
+@router.get("/metrics")
+async def get_analytics_metrics(user: str = Depends(get_ops_user)):
+    """Event buffer depth, flush latency, dropped events and response cache hit ratios"""
+    return {"events": event_buffer.metrics(), "cache": analytics_cache.cache_stats()}
@@ -1,6 +1,36 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, field_validator
+from typing import Dict, List, Literal, Optional
 from datetime import datetime
+from bson import ObjectId
+
+
+class ToneCount(BaseModel):
+    tone: Optional[str] = None
+    count: int
+
+
+class DailyActivity(BaseModel):
+    date: str
+    posts: int
+
+
+class DashboardStats(BaseModel):
+    """Headline numbers for the dashboard"""
+    total_posts: int
+    average_engagement: float
+    top_tone: Optional[str] = None
+    tone_breakdown: List[ToneCount] = []
+    favorite_posts: int = 0
+    favorite_ratio: float = 0
+    recent_activity: List[DailyActivity] = []  # Posts created per day, last 7 days
+    scheduled_posts: Dict[str, int] = {}  # Scheduled post counts by status
+    total_templates: int = 0
+
+
+class TrendPoint(BaseModel):
+    """Average engagement score of the posts created on one day"""
+    date: str
+    score: float
 
 
 class AnalyticsOverview(BaseModel):
@@ -10,7 +40,7 @@ class AnalyticsOverview(BaseModel):
     total_views: int
     total_clicks: int
     total_shares: int
-    engagement_trend: list  # List of dict with date and score
+    engagement_trend: List[TrendPoint]
 
 
 class PostEngagement(BaseModel):
@@ -20,3 +50,16 @@ class PostEngagement(BaseModel):
     clicks: int
     shares: int
     engagement_score: float
+
+
+class EngagementEvent(BaseModel):
+    """A single view, click or share of a post"""
+    post_id: str
+    type: Literal["view", "click", "share"]
+
+    @field_validator("post_id")
+    @classmethod
+    def check_post_id(cls, value: str) -> str:
+        if not ObjectId.is_valid(value):
+            raise ValueError("Invalid post ID")
+        return value
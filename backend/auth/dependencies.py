@@ -11,6 +11,9 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 JWT_SECRET = os.getenv("JWT_SECRET")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM")
 
+# Accounts allowed to read service-wide metrics, e.g. "ops@example.com,admin@example.com"
+OPS_EMAILS = {e.strip().lower() for e in os.getenv("OPS_EMAILS", "").split(",") if e.strip()}
+
 def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
@@ -21,3 +24,10 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         return payload["email"]
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid or Expired token")
+
+
+def get_ops_user(email: str = Depends(get_current_user)):
+    """Signed-in user who may see metrics across all users and workers"""
+    if email.lower() not in OPS_EMAILS:
+        raise HTTPException(status_code=403, detail="Not allowed to view service metrics")
+    return email
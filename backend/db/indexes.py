@@ -0,0 +1,267 @@
+"""
+Index bootstrap and migration runner.
+
+Runs at startup (unless DB_AUTO_MIGRATE=false) or from the command line:
+
+    python -m db.indexes           # create indexes and apply pending migrations
+    python -m db.indexes --check   # also explain every route query, fail on COLLSCAN
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from db.mongodb import database
+from posts.search import content_terms
+from analytics.rollups import rebuild_rollups
+
+load_dotenv()
+
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() == "true"
+AI_USAGE_TTL_DAYS = int(os.getenv("AI_USAGE_TTL_DAYS", "7"))
+
+# Required indexes per collection, matching the query shapes the routes use
+INDEXES = {
+    "posts": [
+        # _id is the keyset pagination tiebreaker, so it is part of every sort index
+        IndexModel([("user_email", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_created_at_id"),
+        IndexModel([("user_email", ASCENDING), ("engagement_score", DESCENDING), ("_id", DESCENDING)], name="user_engagement_score_id"),
+        IndexModel([("user_email", ASCENDING), ("tone", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_tone_created_at_id"),
+        IndexModel([("user_email", ASCENDING), ("is_favorite", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_favorite_created_at_id"),
+        # Full-text search, scoped to one user by the equality prefix
+        IndexModel([("user_email", ASCENDING), ("content", TEXT)], name="user_content_text", default_language="english"),
+        # Prefix search over the stored word list
+        IndexModel([("user_email", ASCENDING), ("content_terms", ASCENDING)], name="user_content_terms"),
+    ],
+    "scheduled_posts": [
+        # Queue claims and the drain loop's next-due lookup
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt_at"),
+        # Reaper lookup of claims whose lease has expired
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_lease_expires_at"),
+        IndexModel([("user_email", ASCENDING), ("scheduled_time", ASCENDING), ("_id", ASCENDING)], name="user_scheduled_time_id"),
+        # Dead-letter listing
+        IndexModel([("user_email", ASCENDING), ("status", ASCENDING), ("scheduled_time", ASCENDING), ("_id", ASCENDING)], name="user_status_scheduled_time_id"),
+    ],
+    "templates": [
+        IndexModel([("user_email", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_created_at_id"),
+    ],
+    "user_preferences": [
+        IndexModel([("user_email", ASCENDING)], name="user_email", unique=True),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email", unique=True),
+    ],
+    "ai_usage": [
+        # Daily usage records are only needed for a few days
+        IndexModel(
+            [("created_at", ASCENDING)],
+            name="created_at_ttl",
+            expireAfterSeconds=AI_USAGE_TTL_DAYS * 24 * 3600
+        ),
+    ],
+    "analytics_daily": [
+        IndexModel([("user_email", ASCENDING), ("date", ASCENDING)], name="user_date", unique=True),
+    ],
+    "generation_cache": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "analytics_cache": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+
+# Representative query shape for each route: (collection, filter, sort)
+QUERY_SHAPES = [
+    ("posts", {"user_email": "check@example.com"}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("posts", {"user_email": "check@example.com"}, [("engagement_score", DESCENDING), ("_id", DESCENDING)]),
+    ("posts", {"user_email": "check@example.com", "tone": "professional"}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("posts", {"user_email": "check@example.com", "is_favorite": True}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("posts", {
+        "user_email": "check@example.com",
+        "$and": [{"$or": [
+            {"created_at": {"$lt": datetime(2024, 1, 1)}},
+            {"created_at": datetime(2024, 1, 1), "_id": {"$lt": ObjectId("000000000000000000000000")}},
+        ]}]
+    }, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("posts", {"user_email": "check@example.com", "created_at": {"$gte": datetime(2024, 1, 1)}}, None),
+    ("posts", {"user_email": "check@example.com", "$text": {"$search": "launch"}}, None),
+    ("posts", {"user_email": "check@example.com", "content_terms": {"$regex": "^lau"}}, None),
+    ("scheduled_posts", {"status": "scheduled", "next_attempt_at": {"$lte": datetime(2024, 1, 1)}}, [("next_attempt_at", ASCENDING)]),
+    ("scheduled_posts", {"status": "running", "lease_expires_at": {"$lt": datetime(2024, 1, 1)}}, None),
+    ("scheduled_posts", {"user_email": "check@example.com", "status": "dead"}, [("scheduled_time", ASCENDING), ("_id", ASCENDING)]),
+    ("scheduled_posts", {"user_email": "check@example.com"}, [("scheduled_time", ASCENDING), ("_id", ASCENDING)]),
+    ("templates", {"user_email": "check@example.com"}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("analytics_daily", {"user_email": "check@example.com", "date": {"$gte": "2024-01-01"}}, None),
+    ("user_preferences", {"user_email": "check@example.com"}, None),
+    ("users", {"email": "check@example.com"}, None),
+]
+
+
+async def ensure_indexes():
+    """Create every declared index. Safe to run repeatedly."""
+    for collection, indexes in INDEXES.items():
+        try:
+            await database[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            # e.g. an existing index with different options, or duplicate data for a unique index
+            print(f"Index creation failed for {collection}: {str(e)}")
+
+
+async def backfill_ai_usage_created_at():
+    """Give old daily usage records a created_at so the TTL index can expire them"""
+    await database.ai_usage.update_many(
+        {"date": {"$exists": True}, "created_at": {"$exists": False}},
+        [{"$set": {"created_at": {"$dateFromString": {"dateString": "$date"}}}}]
+    )
+
+
+async def backfill_post_content_terms():
+    """Store the word list used for prefix search on existing posts"""
+    cursor = database.posts.find(
+        {"content_terms": {"$exists": False}},
+        {"content": 1}
+    ).batch_size(1000)
+
+    batch = []
+    async for post in cursor:
+        batch.append(UpdateOne(
+            {"_id": post["_id"]},
+            {"$set": {"content_terms": content_terms(post.get("content", ""))}}
+        ))
+        if len(batch) >= 1000:
+            await database.posts.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        await database.posts.bulk_write(batch, ordered=False)
+
+
+async def drop_pre_pagination_indexes():
+    """Drop sort indexes replaced by their (..., _id) keyset versions"""
+    superseded = {
+        "posts": ["user_created_at", "user_engagement_score", "user_tone_created_at", "user_favorite_created_at"],
+        "scheduled_posts": ["user_scheduled_time"],
+        "templates": ["user_created_at"],
+    }
+    for collection, names in superseded.items():
+        existing = await database[collection].index_information()
+        for name in names:
+            if name in existing:
+                await database[collection].drop_index(name)
+
+
+async def backfill_scheduled_retry_fields():
+    """Give queued posts a next_attempt_at and dead-letter posts that failed before retries existed"""
+    await database.scheduled_posts.update_many(
+        {"next_attempt_at": {"$exists": False}},
+        [{"$set": {"next_attempt_at": "$scheduled_time"}}]
+    )
+    await database.scheduled_posts.update_many(
+        {"status": "failed"},
+        [{"$set": {
+            "status": "dead",
+            "dead_at": "$$NOW",
+            "error_history": [{"attempt": {"$ifNull": ["$retry_count", 1]}, "error": "$last_error"}]
+        }}]
+    )
+    existing = await database.scheduled_posts.index_information()
+    if "status_scheduled_time" in existing:
+        await database.scheduled_posts.drop_index("status_scheduled_time")
+
+
+# Data migrations, applied once each in order and recorded in the migrations collection
+MIGRATIONS = [
+    ("0001_ai_usage_created_at", backfill_ai_usage_created_at),
+    ("0002_post_content_terms", backfill_post_content_terms),
+    ("0003_drop_pre_pagination_indexes", drop_pre_pagination_indexes),
+    ("0004_analytics_daily_rollups", rebuild_rollups),
+    ("0005_scheduled_retry_fields", backfill_scheduled_retry_fields),
+]
+
+
+async def run_migrations():
+    """
+    Apply pending migrations. Each one is claimed with a "running" record
+    before it starts, so processes starting at the same time never apply it
+    twice. If another process holds a claim, the later migrations are left
+    to that process, since they may depend on the one it is running.
+    """
+    for migration_id, migration in MIGRATIONS:
+        try:
+            await database.migrations.insert_one({
+                "_id": migration_id,
+                "state": "running",
+                "started_at": datetime.utcnow()
+            })
+        except DuplicateKeyError:
+            record = await database.migrations.find_one({"_id": migration_id})
+            # Records from before claims existed have no state and were applied
+            if record.get("state", "applied") == "applied":
+                continue
+            print(f"Migration {migration_id} is being applied by another process (since {record['started_at']}), skipping")
+            return
+
+        print(f"Applying migration {migration_id}")
+        try:
+            await migration()
+        except Exception:
+            # Release the claim so the next start retries it
+            await database.migrations.delete_one({"_id": migration_id, "state": "running"})
+            raise
+        await database.migrations.update_one(
+            {"_id": migration_id},
+            {"$set": {"state": "applied", "applied_at": datetime.utcnow()}}
+        )
+
+
+async def bootstrap_database():
+    """Create indexes and apply migrations (called on startup)"""
+    await ensure_indexes()
+    await run_migrations()
+
+
+def _plan_stages(plan: dict):
+    """Yield every stage name in an explain plan tree"""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+async def check_query_plans() -> list:
+    """Explain every route query shape and return the ones that scan a whole collection"""
+    failures = []
+    for collection, query, sort in QUERY_SHAPES:
+        command = {"find": collection, "filter": query}
+        if sort:
+            command["sort"] = dict(sort)
+        explain = await database.command({"explain": command, "verbosity": "queryPlanner"})
+        stages = list(_plan_stages(explain["queryPlanner"]["winningPlan"]))
+        if "COLLSCAN" in stages:
+            failures.append({"collection": collection, "filter": query, "sort": sort, "stages": stages})
+    return failures
+
+
+async def main(check: bool):
+    await bootstrap_database()
+    print("Indexes and migrations are up to date")
+
+    if check:
+        failures = await check_query_plans()
+        for failure in failures:
+            print(f"COLLSCAN on {failure['collection']}: filter={failure['filter']} sort={failure['sort']}")
+        if failures:
+            sys.exit(1)
+        print(f"All {len(QUERY_SHAPES)} query shapes use an index")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(check="--check" in sys.argv))
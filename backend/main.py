@@ -1,10 +1,16 @@
+from datetime import datetime
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from db.mongodb import database
+from db.indexes import DB_AUTO_MIGRATE, bootstrap_database
 from auth.routes import router as auth_router
 from ai.routes import router as ai_router
-from scheduler.worker import scheduler, process_scheduled_posts
+from scheduler.worker import SCHEDULER_REAP_SECONDS, reap_expired_leases, scheduler, start_scheduler_loop, stop_scheduler_loop
+from scheduler.routes import router as scheduler_router
+from ai.service import close_client
+from ai.rate_limit import RATE_LIMIT_LOCAL, RATE_LIMIT_SYNC_SECONDS, sync_rate_limit_counters
 from analytics.routes import router as analytics_router
+from analytics.events import ANALYTICS_FLUSH_SECONDS, flush_events
 from posts.routes import router as posts_router
 from templates.routes import router as templates_router
 from user_profile.routes import router as profile_router
@@ -36,14 +42,40 @@ async def test_db():
     }
 
 
+@app.on_event("startup")
+async def prepare_database():
+    if DB_AUTO_MIGRATE:
+        try:
+            await bootstrap_database()
+        except Exception as e:
+            print(f"Database bootstrap failed: {str(e)}")
+
+
 @app.on_event("startup")
 async def start_scheduler():
-    scheduler.add_job(process_scheduled_posts, "interval", minutes=1)
+    # Scheduled posts are drained continuously, the other jobs run on intervals
+    start_scheduler_loop()
+    # Runs once right away to recover posts left running by a crashed process
+    scheduler.add_job(reap_expired_leases, "interval", seconds=SCHEDULER_REAP_SECONDS, next_run_time=datetime.now())
+    scheduler.add_job(flush_events, "interval", seconds=ANALYTICS_FLUSH_SECONDS)
+    if RATE_LIMIT_LOCAL:
+        scheduler.add_job(sync_rate_limit_counters, "interval", seconds=RATE_LIMIT_SYNC_SECONDS)
     scheduler.start()
 
+
+@app.on_event("shutdown")
+async def close_ai_client():
+    await stop_scheduler_loop()
+    # Write out buffered engagement events before the process exits
+    await flush_events()
+    if RATE_LIMIT_LOCAL:
+        await sync_rate_limit_counters()
+    await close_client()
+
 app.include_router(auth_router)
 app.include_router(ai_router)
 app.include_router(analytics_router)
 app.include_router(posts_router)
 app.include_router(templates_router)
-app.include_router(profile_router)
\ No newline at end of file
+app.include_router(profile_router)
+app.include_router(scheduler_router)
\ No newline at end of file
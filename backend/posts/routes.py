@@ -1,51 +1,200 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Tuple
 from auth.dependencies import get_current_user
 from db.mongodb import database
-from posts.schemas import PostCreate, PostUpdate
+from posts.schemas import PostCreate, PostUpdate, PostOut, PostPage
+from posts.search import build_search_filter, content_terms
+from analytics.rollups import record_change, record_changes
+from analytics.cache import invalidate as invalidate_analytics
+from scheduler.worker import wake_scheduler
+from utils.pagination import paginate, page_size, decode_cursor, encode_cursor, keyset_filter
+from utils.serialization import MongoJSONResponse, dumps, field_projection
 from bson import ObjectId
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+import csv
+import io
+import json
+import os
 import random
 
 
 router = APIRouter(prefix="/posts", tags=["Posts"])
 
+# content_terms is an internal search field, never returned to clients
+HIDDEN_FIELDS = {"content_terms": 0}
 
-@router.post("/create")
-async def create_post(post: PostCreate, user: str = Depends(get_current_user)):
-    post_data = {
+# Sort fields that every post has, so keyset cursors are always well defined
+SORT_FIELDS = {"created_at", "engagement_score", "relevance"}
+
+# Fields a client can ask for with `fields=`
+POST_FIELDS = set(PostOut.model_fields) - {"id", "score"}
+
+# Documents read from Mongo and written to the client per export chunk
+EXPORT_BATCH_SIZE = int(os.getenv("POSTS_EXPORT_BATCH_SIZE", "500"))
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+CSV_COLUMNS = ["_id", "content", "tone", "engagement_score", "is_favorite",
+               "views", "clicks", "shares", "created_at", "updated_at"]
+
+# Bulk import limits
+IMPORT_CHUNK_SIZE = int(os.getenv("POSTS_IMPORT_CHUNK_SIZE", "1000"))
+IMPORT_MAX_ROWS = int(os.getenv("POSTS_IMPORT_MAX_ROWS", "100000"))
+IMPORT_MAX_ERRORS = 1000  # Per-row errors reported back, the rest are only counted
+
+
+def new_post_document(user: str, post: PostCreate) -> dict:
+    """The document stored for a newly created post"""
+    return {
         "user_email": user,
         "content": post.content,
+        "content_terms": content_terms(post.content),
         "tone": post.tone,
         # fake engagement for now (AI / LinkedIn later)
         "engagement_score": round(random.uniform(0.5, 1.0), 2),
         "created_at": datetime.utcnow(),
     }
-    result = await database.posts.insert_one(post_data)
-    post_data["_id"] = str(result.inserted_id)
-    post_data["created_at"] = post_data["created_at"].isoformat()
-    return {"message": "Post created successfully", "post": post_data}
 
 
-@router.get("/all")
-async def get_all_posts(
-    user: str = Depends(get_current_user),
+@router.post("/create")
+async def create_post(post: PostCreate, user: str = Depends(get_current_user)):
+    post_data = new_post_document(user, post)
+    await database.posts.insert_one(post_data)
+    await record_change(None, post_data)
+    post_data.pop("content_terms")
+    return MongoJSONResponse({"message": "Post created successfully", "post": post_data})
+
+
+async def _import_rows(request: Request):
+    """Yield (row number, parsed item or error) from a JSON array or NDJSON body"""
+    content_type = request.headers.get("content-type", "")
+
+    if "ndjson" in content_type or "jsonl" in content_type:
+        # Parse lines as they arrive instead of buffering the whole upload
+        row = 0
+        pending = b""
+        async for chunk in request.stream():
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield row, _parse_line(line)
+                    row += 1
+        if pending.strip():
+            yield row, _parse_line(pending)
+        return
+
+    try:
+        items = json.loads(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of posts or an NDJSON body")
+    for row, item in enumerate(items):
+        yield row, item
+
+
+def _parse_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON: {str(e)}")
+
+
+@router.post("/import")
+async def import_posts(request: Request, user: str = Depends(get_current_user)):
+    """
+    Create many posts in one request.
+
+    The body is either a JSON array of {"content", "tone"} objects or NDJSON
+    (Content-Type: application/x-ndjson) with one object per line. Rows are
+    validated and written in chunks with unordered insert_many, so a bad row
+    is reported in `errors` without failing the rest of the import.
+    """
+    inserted = 0
+    failed = 0
+    errors = []
+
+    def record_error(row: int, message: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < IMPORT_MAX_ERRORS:
+            errors.append({"row": row, "error": message})
+
+    async def write(chunk: list):
+        nonlocal inserted
+        if not chunk:
+            return
+        rows = [row for row, _ in chunk]
+        docs = [doc for _, doc in chunk]
+        failed_indexes = set()
+        try:
+            result = await database.posts.insert_many(docs, ordered=False)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            # Unordered inserts keep going past failures; only the listed rows failed
+            inserted += e.details.get("nInserted", 0)
+            for write_error in e.details.get("writeErrors", []):
+                failed_indexes.add(write_error["index"])
+                record_error(rows[write_error["index"]], write_error.get("errmsg", "Write failed"))
+        await record_changes(
+            (None, doc) for i, doc in enumerate(docs) if i not in failed_indexes
+        )
+
+    chunk = []
+    async for row, item in _import_rows(request):
+        if row >= IMPORT_MAX_ROWS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Imports are limited to {IMPORT_MAX_ROWS} posts, {inserted} were imported"
+            )
+        if isinstance(item, Exception):
+            record_error(row, str(item))
+            continue
+        try:
+            post = PostCreate.model_validate(item)
+        except ValidationError as e:
+            record_error(row, "; ".join(
+                f"{'.'.join(str(p) for p in err['loc']) or 'item'}: {err['msg']}" for err in e.errors()
+            ))
+            continue
+
+        chunk.append((row, new_post_document(user, post)))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            await write(chunk)
+            chunk = []
+    await write(chunk)
+
+    return {
+        "message": f"Imported {inserted} posts",
+        "inserted": inserted,
+        "failed": failed,
+        "errors": errors
+    }
+
+
+def build_posts_query(
+    user: str,
     search: Optional[str] = None,
     tone: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
     min_score: Optional[float] = None,
-    is_favorite: Optional[bool] = None,
-    sort_by: Optional[str] = "created_at",
-    sort_order: Optional[str] = "desc"
-):
-    """Get all posts with optional search, filtering, and sorting"""
+    is_favorite: Optional[bool] = None
+) -> Tuple[dict, bool]:
+    """
+    Build the Mongo filter for a user's posts from the list/export filters.
+    Returns (query, uses_text_index).
+    """
     # Build query
     query = {"user_email": user}
     
     # Add search filter
+    uses_text_index = False
     if search:
-        query["content"] = {"$regex": search, "$options": "i"}
+        search_filter, uses_text_index = build_search_filter(search)
+        query.update(search_filter)
     
     # Add tone filter
     if tone:
@@ -68,20 +217,170 @@ async def get_all_posts(
             date_query["$lte"] = datetime.fromisoformat(date_to)
         if date_query:
             query["created_at"] = date_query
-    
+
+    return query, uses_text_index
+
+
+@router.get("/all", response_model=PostPage, response_model_exclude_unset=True)
+async def get_all_posts(
+    user: str = Depends(get_current_user),
+    search: Optional[str] = None,
+    tone: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    min_score: Optional[float] = None,
+    is_favorite: Optional[bool] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "desc",
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """
+    Get posts with optional search, filtering, and sorting, one page at a time.
+
+    `search` uses the text index: plain words match stemmed terms,
+    "quoted text" matches a phrase and word* matches a prefix. Results
+    are ranked by relevance unless another sort_by is given.
+
+    Returns {"items": [...], "next_cursor": ...}; pass next_cursor back
+    as `cursor` to get the following page. `fields` is a comma separated
+    list of the post fields to return (e.g. `fields=content,created_at`).
+    """
+    query, uses_text_index = build_posts_query(
+        user, search, tone, date_from, date_to, min_score, is_favorite
+    )
+
     # Determine sort direction
     sort_direction = -1 if sort_order == "desc" else 1
-    
-    # Get posts with filters and sorting
-    posts = await database.posts.find(query).sort(sort_by, sort_direction).to_list(100)
-    
-    for post in posts:
-        post["_id"] = str(post["_id"])
-        post["created_at"] = post["created_at"].isoformat()
-        if "updated_at" in post:
-            post["updated_at"] = post["updated_at"].isoformat()
-    
-    return posts
+
+    if sort_by is None:
+        sort_by = "relevance" if uses_text_index else "created_at"
+
+    if sort_by not in SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of {sorted(SORT_FIELDS)}")
+
+    # Only pull the requested columns; the sort key is always needed for the cursor
+    projection = field_projection(
+        fields, POST_FIELDS, required=[] if sort_by == "relevance" else [sort_by]
+    ) or HIDDEN_FIELDS
+
+    # Get one page of posts with filters and sorting
+    if sort_by == "relevance":
+        if not uses_text_index:
+            raise HTTPException(status_code=400, detail="Relevance sorting needs a word or phrase search")
+        posts, next_cursor = await paginate_by_relevance(query, limit, cursor, projection)
+    else:
+        posts, next_cursor = await paginate(
+            database.posts, query, sort_by, sort_direction,
+            limit=limit, cursor=cursor, projection=projection
+        )
+
+    return {"items": posts, "next_cursor": next_cursor}
+
+
+async def paginate_by_relevance(
+    query: dict,
+    limit: Optional[int],
+    cursor: Optional[str],
+    projection: dict = HIDDEN_FIELDS
+):
+    """Keyset pagination over (textScore, _id), best matches first"""
+    size = page_size(limit)
+
+    pipeline = [
+        {"$match": query},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+    ]
+    if cursor:
+        score, doc_id = decode_cursor(cursor, "relevance")
+        pipeline.append({"$match": keyset_filter("score", -1, score, doc_id)})
+    pipeline += [
+        {"$sort": {"score": -1, "_id": -1}},
+        {"$limit": size + 1},
+        # An inclusion projection must keep the score the cursor is built from
+        {"$project": projection if projection is HIDDEN_FIELDS else {**projection, "score": 1}},
+    ]
+
+    posts = await database.posts.aggregate(pipeline).to_list(size + 1)
+
+    next_cursor = None
+    if len(posts) > size:
+        posts = posts[:size]
+        next_cursor = encode_cursor("relevance", posts[-1]["score"], posts[-1]["_id"])
+    return posts, next_cursor
+
+@router.get("/export")
+async def export_posts(
+    user: str = Depends(get_current_user),
+    format: str = "ndjson",
+    search: Optional[str] = None,
+    tone: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    min_score: Optional[float] = None,
+    is_favorite: Optional[bool] = None,
+    sort_by: str = "created_at",
+    sort_order: Optional[str] = "desc",
+    fields: Optional[str] = None
+):
+    """
+    Stream all of the user's matching posts as NDJSON or CSV.
+
+    Takes the same filters as /posts/all but has no page limit. Posts are
+    read from a Mongo cursor in fixed size batches and each batch is
+    written out before the next is fetched, so memory use stays flat
+    however many posts the user has.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {sorted(EXPORT_FORMATS)}")
+    if sort_by not in SORT_FIELDS - {"relevance"}:
+        raise HTTPException(status_code=400, detail="sort_by must be created_at or engagement_score")
+
+    query, _ = build_posts_query(user, search, tone, date_from, date_to, min_score, is_favorite)
+    projection = field_projection(fields, POST_FIELDS) or HIDDEN_FIELDS
+    columns = CSV_COLUMNS if fields is None else [c for c in CSV_COLUMNS if c in projection]
+    sort_direction = -1 if sort_order == "desc" else 1
+
+    cursor = database.posts.find(query, projection).sort(
+        [(sort_by, sort_direction), ("_id", sort_direction)]
+    ).batch_size(EXPORT_BATCH_SIZE)
+
+    def render(batch: list) -> bytes:
+        if format == "ndjson":
+            return b"".join(dumps(post) + b"\n" for post in batch)
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+        for post in batch:
+            writer.writerow({
+                key: value.isoformat() if isinstance(value, datetime) else value
+                for key, value in post.items()
+            })
+        return buffer.getvalue().encode("utf-8")
+
+    async def stream():
+        try:
+            if format == "csv":
+                yield (",".join(columns) + "\r\n").encode("utf-8")
+            batch = []
+            async for post in cursor:
+                batch.append(post)
+                if len(batch) >= EXPORT_BATCH_SIZE:
+                    yield render(batch)
+                    batch = []
+            if batch:
+                yield render(batch)
+        finally:
+            # Stop the server side cursor if the client disconnects early
+            await cursor.close()
+
+    filename = f"posts-{datetime.utcnow():%Y%m%d}.{format}"
+    return StreamingResponse(
+        stream(),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 
 @router.post("/schedule")
 async def schedule_post(
@@ -93,29 +392,34 @@ async def schedule_post(
         "user_email": email,
         "content": post.content,
         "scheduled_time": schedule_time,
+        # When the queue may next try to publish it; pushed back on retries
+        "next_attempt_at": schedule_time,
         "status": "scheduled",
         "retry_count": 0,
         "last_error": None,
         "created_at": datetime.utcnow(),
     }
     await database.scheduled_posts.insert_one(post)
+    await invalidate_analytics(email)
+    # The drain loop may be sleeping until a later post
+    wake_scheduler()
     return {"message": "Post scheduled successfully"}
 
-@router.get("/{post_id}")
+@router.get("/{post_id}", response_model=PostOut, response_model_exclude_unset=True)
 async def get_post(post_id: str, user: str = Depends(get_current_user)):
     """Get a single post by ID"""
     try:
         post = await database.posts.find_one({
             "_id": ObjectId(post_id),
             "user_email": user
-        })
+        }, HIDDEN_FIELDS)
         
         if not post:
             raise HTTPException(status_code=404, detail="Post not found")
         
-        post["_id"] = str(post["_id"])
-        post["created_at"] = post["created_at"].isoformat()
         return post
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid post ID: {str(e)}")
 
@@ -140,6 +444,7 @@ async def update_post(
         update_data = {}
         if post_update.content is not None:
             update_data["content"] = post_update.content
+            update_data["content_terms"] = content_terms(post_update.content)
         if post_update.tone is not None:
             update_data["tone"] = post_update.tone
         
@@ -155,13 +460,10 @@ async def update_post(
         )
         
         # Fetch and return updated post
-        updated_post = await database.posts.find_one({"_id": ObjectId(post_id)})
-        updated_post["_id"] = str(updated_post["_id"])
-        updated_post["created_at"] = updated_post["created_at"].isoformat()
-        if "updated_at" in updated_post:
-            updated_post["updated_at"] = updated_post["updated_at"].isoformat()
+        updated_post = await database.posts.find_one({"_id": ObjectId(post_id)}, HIDDEN_FIELDS)
+        await record_change(existing_post, updated_post)
         
-        return {"message": "Post updated successfully", "post": updated_post}
+        return MongoJSONResponse({"message": "Post updated successfully", "post": updated_post})
     except HTTPException:
         raise
     except Exception as e:
@@ -181,7 +483,9 @@ async def delete_post(post_id: str, user: str = Depends(get_current_user)):
             raise HTTPException(status_code=404, detail="Post not found")
         
         # Delete the post
-        await database.posts.delete_one({"_id": ObjectId(post_id)})
+        result = await database.posts.delete_one({"_id": ObjectId(post_id)})
+        if result.deleted_count:
+            await record_change(existing_post, None)
         
         return {"message": "Post deleted successfully"}
     except HTTPException:
@@ -210,6 +514,7 @@ async def toggle_favorite(post_id: str, user: str = Depends(get_current_user)):
             {"_id": ObjectId(post_id)},
             {"$set": {"is_favorite": new_favorite}}
         )
+        await record_change(post, {**post, "is_favorite": new_favorite})
         
         return {
             "message": f"Post {'added to' if new_favorite else 'removed from'} favorites",
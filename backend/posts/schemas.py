@@ -1,5 +1,7 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from utils.serialization import MongoModel
 
 class PostCreate(BaseModel):
     content: str
@@ -7,4 +9,44 @@ class PostCreate(BaseModel):
 
 class PostUpdate(BaseModel):
     content: Optional[str] = None
-    tone: Optional[str] = None
\ No newline at end of file
+    tone: Optional[str] = None
+
+
+class PostOut(MongoModel):
+    """A stored post; every field but _id is optional so `fields=` can trim it"""
+    user_email: Optional[str] = None
+    content: Optional[str] = None
+    tone: Optional[str] = None
+    engagement_score: Optional[float] = None
+    is_favorite: Optional[bool] = None
+    views: Optional[int] = None
+    clicks: Optional[int] = None
+    shares: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    score: Optional[float] = None  # Text search relevance, only when sorted by relevance
+
+
+class PostPage(BaseModel):
+    items: List[PostOut]
+    next_cursor: Optional[str] = None
+
+
+class ScheduledPostOut(MongoModel):
+    user_email: Optional[str] = None
+    content: Optional[str] = None
+    scheduled_time: Optional[datetime] = None
+    status: Optional[str] = None
+    retry_count: Optional[int] = None
+    last_error: Optional[str] = None
+    next_attempt_at: Optional[datetime] = None
+    published_at: Optional[datetime] = None
+    lateness_seconds: Optional[float] = None
+    dead_at: Optional[datetime] = None
+    error_history: Optional[List[Dict[str, Any]]] = None
+    created_at: Optional[datetime] = None
+
+
+class ScheduledPostPage(BaseModel):
+    items: List[ScheduledPostOut]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,61 @@
+import re
+from typing import List, Tuple
+
+WORD_RE = re.compile(r"\w+")
+PHRASE_RE = re.compile(r'"([^"]+)"')
+
+# Stored alongside each post for indexed prefix matching (the text index cannot do prefixes)
+MAX_CONTENT_TERMS = 1000
+
+
+def content_terms(content: str) -> List[str]:
+    """Unique lowercase words of a post, in order of first appearance"""
+    terms = dict.fromkeys(WORD_RE.findall(content.lower()))
+    return list(terms)[:MAX_CONTENT_TERMS]
+
+
+def parse_search(search: str) -> Tuple[str, List[str]]:
+    """
+    Split a search string into a $text search string and prefix terms.
+
+    "exact phrase"  -> phrase match through the text index
+    word            -> stemmed word match through the text index
+    word*           -> prefix match on content_terms
+    """
+    phrases = PHRASE_RE.findall(search)
+    rest = PHRASE_RE.sub(" ", search)
+
+    words = []
+    prefixes = []
+    for token in rest.split():
+        if token.endswith("*") and WORD_RE.fullmatch(token.rstrip("*")):
+            prefixes.append(token.rstrip("*").lower())
+        elif WORD_RE.search(token):
+            # Drop $text operators (leading "-") so user input is only ever terms
+            words.append(" ".join(WORD_RE.findall(token)))
+
+    text_search = " ".join([f'"{p.strip()}"' for p in phrases if p.strip()] + words)
+    return text_search, prefixes
+
+
+def build_search_filter(search: str) -> Tuple[dict, bool]:
+    """
+    Build the Mongo filter for a search string.
+    Returns (filter, uses_text_index) so callers know relevance sorting is possible.
+    """
+    text_search, prefixes = parse_search(search)
+
+    conditions = [
+        # Anchored and escaped, so it uses the index bounds and cannot blow up
+        {"content_terms": {"$regex": f"^{re.escape(prefix)}"}}
+        for prefix in prefixes
+    ]
+
+    if text_search:
+        conditions.insert(0, {"$text": {"$search": text_search}})
+
+    if not conditions:
+        return {}, False
+    if len(conditions) == 1:
+        return conditions[0], bool(text_search)
+    return {"$and": conditions}, bool(text_search)
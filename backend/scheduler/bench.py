@@ -0,0 +1,106 @@
+"""
+Publish lateness benchmark for the scheduled post queue.
+
+Schedules --posts posts, due evenly over --spread seconds, in a scratch
+database and drains them with --workers in-process scheduler loops, each with
+its own worker_id. publish_post is replaced by a --publish-ms sleep. Reports
+drain time, throughput and lateness (published_at - scheduled_time)
+percentiles:
+
+    python -m scheduler.bench --posts 5000 --workers 4 [--spread 10] [--publish-ms 50] [--in-memory]
+
+Runs against MONGODB_URI using the --database database (default
+scheduler_bench), which is dropped before and after the run. --in-memory
+uses mongomock-motor (from requirements-dev.txt) instead; every claim then
+scans the whole collection in Python, so it checks the queue logic rather
+than measuring MongoDB.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+from db.indexes import INDEXES
+from db.mongodb import client, database as app_database
+from scheduler import worker
+
+
+def percentile(ordered: list, q: float) -> float:
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+async def run(posts: int, workers: int, spread: float, publish_ms: float, database_name: str,
+              in_memory: bool = False) -> None:
+    if database_name == app_database.name and not in_memory:
+        sys.exit("Refusing to run against the application database, pass another --database")
+
+    bench_client = client
+    if in_memory:
+        from mongomock_motor import AsyncMongoMockClient
+        bench_client = AsyncMongoMockClient()
+    bench_database = bench_client[database_name]
+    await bench_client.drop_database(database_name)
+    await bench_database.scheduled_posts.create_indexes(INDEXES["scheduled_posts"])
+    worker.database = bench_database
+
+    async def publish(post: dict, idempotency_key: str) -> None:
+        await asyncio.sleep(publish_ms / 1000)
+
+    worker.publish_post = publish
+
+    start = datetime.utcnow() + timedelta(seconds=1)
+    step = spread / posts
+    documents = []
+    for i in range(posts):
+        due = start + timedelta(seconds=i * step)
+        documents.append({
+            "user_email": "bench@example.com",
+            "content": f"Benchmark post {i}",
+            "status": "scheduled",
+            "scheduled_time": due,
+            "next_attempt_at": due,
+            "retry_count": 0
+        })
+    for i in range(0, posts, 1000):
+        await bench_database.scheduled_posts.insert_many(documents[i:i + 1000], ordered=False)
+
+    started = time.perf_counter()
+    loops = [
+        asyncio.create_task(worker.run_scheduler_loop(f"bench-{i}"))
+        for i in range(workers)
+    ]
+    try:
+        while await bench_database.scheduled_posts.count_documents({"status": "posted"}) < posts:
+            await asyncio.sleep(0.25)
+        elapsed = time.perf_counter() - started
+    finally:
+        worker.stop_event.set()
+        worker.wake_event.set()
+        await asyncio.gather(*loops, return_exceptions=True)
+
+    lateness = sorted([
+        post["lateness_seconds"]
+        async for post in bench_database.scheduled_posts.find({}, {"lateness_seconds": 1})
+    ])
+    duplicates = worker.scheduler_stats["published"] - posts
+    await bench_client.drop_database(database_name)
+
+    print(f"Posts: {posts}, workers: {workers}, concurrency per worker: {worker.SCHEDULER_CONCURRENCY}")
+    print(f"Drained in {elapsed:.2f}s ({spread:.0f}s of due times), {posts / elapsed:.0f} posts/s")
+    print(
+        f"Lateness p50 {percentile(lateness, 0.5):.3f}s, p95 {percentile(lateness, 0.95):.3f}s, "
+        f"p99 {percentile(lateness, 0.99):.3f}s, max {lateness[-1]:.3f}s"
+    )
+    print(f"Duplicate publishes: {duplicates}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scheduled post publish lateness benchmark")
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--spread", type=float, default=10, help="Seconds over which the posts fall due")
+    parser.add_argument("--publish-ms", type=float, default=50, help="Simulated publish latency")
+    parser.add_argument("--database", default="scheduler_bench")
+    parser.add_argument("--in-memory", action="store_true", help="Use mongomock-motor instead of MONGODB_URI")
+    args = parser.parse_args()
+    asyncio.run(run(args.posts, args.workers, args.spread, args.publish_ms, args.database, args.in_memory))
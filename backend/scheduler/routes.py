@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, HTTPException
+from bson import ObjectId
+from typing import Optional
+from auth.dependencies import get_current_user, get_ops_user
+from db.mongodb import database
+from posts.schemas import ScheduledPostOut, ScheduledPostPage
+from scheduler.worker import queue_stats, requeue_dead_post
+from utils.pagination import paginate
+
+router = APIRouter(prefix="/scheduler", tags=["Scheduler"])
+
+
+@router.get("/metrics")
+async def get_scheduler_metrics(user: str = Depends(get_ops_user)):
+    """Queue depth by status and this worker's claim/publish counters"""
+    try:
+        return await queue_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching scheduler metrics: {str(e)}")
+
+
+@router.get("/dead", response_model=ScheduledPostPage, response_model_exclude_unset=True)
+async def get_dead_posts(
+    user: str = Depends(get_current_user),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    """Scheduled posts that ran out of retries or failed permanently, with their error history"""
+    try:
+        posts, next_cursor = await paginate(
+            database.scheduled_posts, {"user_email": user, "status": "dead"}, "scheduled_time", 1,
+            limit=limit, cursor=cursor
+        )
+        return {"items": posts, "next_cursor": next_cursor}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching dead-lettered posts: {str(e)}")
+
+
+@router.post("/dead/{post_id}/requeue", response_model=ScheduledPostOut, response_model_exclude_unset=True)
+async def requeue_post(post_id: str, user: str = Depends(get_current_user)):
+    """Put a dead-lettered post back on the queue to be published now"""
+    try:
+        post = await requeue_dead_post(ObjectId(post_id), user)
+        if not post:
+            raise HTTPException(status_code=404, detail="Dead-lettered post not found")
+        return post
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid post ID: {str(e)}")
@@ -1,39 +1,386 @@
+import asyncio
+import os
+import random
+import socket
+import uuid
+from collections import deque
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Optional
+from dotenv import load_dotenv
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from db.mongodb import database
 
+load_dotenv()
+
+# Queue worker configuration
+SCHEDULER_WORKER_ID = os.getenv("SCHEDULER_WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", "5"))  # Posts published at once
+SCHEDULER_BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", "100"))  # Posts claimed per run
+# Renewed every third of this while a publish runs; a claim not renewed for this long is presumed dead and reaped
+SCHEDULER_LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", "300"))
+SCHEDULER_REAP_SECONDS = int(os.getenv("SCHEDULER_REAP_SECONDS", "60"))  # How often expired claims are reaped
+# Longest idle sleep; bounds how late a post scheduled by another process can be picked up
+SCHEDULER_MAX_SLEEP_SECONDS = float(os.getenv("SCHEDULER_MAX_SLEEP_SECONDS", "60"))
+SCHEDULER_ERROR_BACKOFF_SECONDS = 5
+# Retry policy for failed publishes
+SCHEDULER_MAX_ATTEMPTS = int(os.getenv("SCHEDULER_MAX_ATTEMPTS", "5"))
+SCHEDULER_RETRY_BASE_SECONDS = float(os.getenv("SCHEDULER_RETRY_BASE_SECONDS", "30"))
+SCHEDULER_RETRY_MAX_SECONDS = float(os.getenv("SCHEDULER_RETRY_MAX_SECONDS", "3600"))
+SCHEDULER_STOP_TIMEOUT_SECONDS = 30
+
 scheduler = AsyncIOScheduler()
 
-async def process_scheduled_posts():
+
+class PermanentPublishError(Exception):
+    """A publish failure that retrying cannot fix (e.g. rejected content)"""
+
+
+class LeaseExpiredError(Exception):
+    """The claiming worker crashed or hung before recording the publish outcome"""
+
+
+scheduler_stats = {
+    "claimed": 0,
+    "published": 0,
+    "failed": 0,
+    "retried": 0,
+    "dead_lettered": 0,
+    "in_flight": 0,
+    "lost_claims": 0,  # Status updates skipped because another worker owns the post now
+    "reaped": 0,  # Expired claims returned to the queue
+    "duplicates_skipped": 0  # Re-delivered posts that had already been published
+}
+
+# Publish lateness (published_at - scheduled_time) of the most recent posts
+recent_lateness = deque(maxlen=1000)
+
+# Set to cut the drain loop's idle sleep short, e.g. when a post is scheduled
+wake_event = asyncio.Event()
+stop_event = asyncio.Event()
+scheduler_task: Optional[asyncio.Task] = None
+
+
+async def claim_next_post(worker_id: str = SCHEDULER_WORKER_ID) -> Optional[dict]:
+    """
+    Atomically take the oldest due post off the queue. Only one worker can
+    move a post from scheduled to running, so each post is claimed once.
+    """
+    now = datetime.utcnow()
+    post = await database.scheduled_posts.find_one_and_update(
+        {"status": "scheduled", "next_attempt_at": {"$lte": now}},
+        {"$set": {
+            "status": "running",
+            "worker_id": worker_id,
+            "claimed_at": now,
+            "lease_expires_at": now + timedelta(seconds=SCHEDULER_LEASE_SECONDS)
+        }},
+        sort=[("next_attempt_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+    if post:
+        scheduler_stats["claimed"] += 1
+    return post
+
+
+async def publish_post(post: dict, idempotency_key: str) -> None:
+    # Simulate posting (LinkedIn API Later). Send idempotency_key with the
+    # request so the API drops a repeat of a publish that was not recorded.
+    print("Posting: ", post["content"])
+
+
+async def begin_publication(post: dict, worker_id: str) -> dict:
+    """
+    Record the intent to publish a post before publishing it, keyed by its
+    id. Returns the record, which is the earlier one if another delivery got
+    there first: "published" if the post is out, "publishing" if a publish
+    was started but its outcome never recorded.
+    """
+    publication = {"_id": post["_id"], "state": "publishing", "started_at": datetime.utcnow(), "worker_id": worker_id}
+    try:
+        await database.publications.insert_one(publication)
+    except DuplicateKeyError:
+        return await database.publications.find_one({"_id": post["_id"]})
+    return publication
+
+
+async def finish_publication(post: dict, worker_id: str) -> dict:
+    """Mark a post's publication as done. Keeps the first outcome if one was already recorded."""
+    publication = await database.publications.find_one_and_update(
+        {"_id": post["_id"], "state": "publishing"},
+        {"$set": {"state": "published", "published_at": datetime.utcnow(), "worker_id": worker_id}},
+        return_document=ReturnDocument.AFTER
+    )
+    return publication or await database.publications.find_one({"_id": post["_id"]})
+
+
+async def renew_lease(claim: dict) -> None:
+    """Keep extending a claim's lease while its publish runs, so a slow publish is not reaped"""
+    while True:
+        await asyncio.sleep(SCHEDULER_LEASE_SECONDS / 3)
+        await database.scheduled_posts.update_one(
+            claim,
+            {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=SCHEDULER_LEASE_SECONDS)}}
+        )
+
+
+def retry_delay_seconds(attempt: int) -> float:
+    """
+    Exponential backoff with jitter: half of the capped delay is fixed and
+    half random, so retries back off and posts that failed together during
+    an upstream outage do not all retry at the same moment.
+    """
+    cap = min(SCHEDULER_RETRY_MAX_SECONDS, SCHEDULER_RETRY_BASE_SECONDS * (2 ** (attempt - 1)))
+    return cap / 2 + random.uniform(0, cap / 2)
+
+
+def failure_update(post: dict, error: Exception, worker_id: Optional[str]) -> dict:
+    """Requeue a failed post with backoff, or dead-letter it once it cannot succeed"""
+    now = datetime.utcnow()
+    attempt = post.get("retry_count", 0) + 1
+    permanent = isinstance(error, PermanentPublishError)
+    history_entry = {
+        "attempt": attempt,
+        "at": now,
+        "error": str(error),
+        "permanent": permanent,
+        "worker_id": worker_id
+    }
+
+    update = {
+        "$inc": {"retry_count": 1},
+        "$push": {"error_history": history_entry},
+        "$unset": {"lease_expires_at": "", "worker_id": ""}
+    }
+    if permanent or attempt >= SCHEDULER_MAX_ATTEMPTS:
+        scheduler_stats["dead_lettered"] += 1
+        update["$set"] = {"status": "dead", "last_error": str(error), "dead_at": now}
+    else:
+        scheduler_stats["retried"] += 1
+        update["$set"] = {
+            "status": "scheduled",
+            "last_error": str(error),
+            "next_attempt_at": now + timedelta(seconds=retry_delay_seconds(attempt))
+        }
+    return update
+
+
+async def process_claimed_post(post: dict, worker_id: str = SCHEDULER_WORKER_ID) -> None:
+    """Publish a claimed post and record the outcome, if the claim is still ours"""
+    # Only the worker holding the claim may change the post's status
+    claim = {"_id": post["_id"], "status": "running", "worker_id": worker_id}
+
+    scheduler_stats["in_flight"] += 1
+    try:
+        # A post re-delivered after a crash may already be out; never publish it twice.
+        # One cut off mid-publish is sent again under the same idempotency key.
+        publication = await begin_publication(post, worker_id)
+        if publication.get("state", "published") == "published":
+            scheduler_stats["duplicates_skipped"] += 1
+        else:
+            renewal = asyncio.create_task(renew_lease(claim))
+            try:
+                await publish_post(post, str(post["_id"]))
+            finally:
+                renewal.cancel()
+            publication = await finish_publication(post, worker_id)
+            scheduler_stats["published"] += 1
+        published_at = publication["published_at"]
+        lateness = (published_at - post["scheduled_time"]).total_seconds()
+        result = await database.scheduled_posts.update_one(
+            claim,
+            {
+                "$set": {
+                    "status": "posted",
+                    "published_at": published_at,
+                    "lateness_seconds": round(lateness, 3)
+                },
+                "$unset": {"lease_expires_at": ""}
+            }
+        )
+        recent_lateness.append(lateness)
+    except Exception as e:
+        scheduler_stats["failed"] += 1
+        result = await database.scheduled_posts.update_one(claim, failure_update(post, e, worker_id))
+    finally:
+        scheduler_stats["in_flight"] -= 1
+
+    if result.matched_count == 0:
+        scheduler_stats["lost_claims"] += 1
+
+
+async def process_scheduled_posts(worker_id: str = SCHEDULER_WORKER_ID) -> int:
+    """
+    Claim and publish due posts, SCHEDULER_CONCURRENCY at a time, until none
+    are due or SCHEDULER_BATCH_SIZE have been claimed. Safe to run in several
+    processes at once. Returns the number of posts claimed.
+    """
+    claimed = 0
+
+    async def run_slot():
+        nonlocal claimed
+        while claimed < SCHEDULER_BATCH_SIZE and not stop_event.is_set():
+            # Count the claim before awaiting so slots never overshoot the batch
+            claimed += 1
+            post = await claim_next_post(worker_id)
+            if not post:
+                claimed -= 1
+                return
+            await process_claimed_post(post, worker_id)
+
+    await asyncio.gather(*(run_slot() for _ in range(SCHEDULER_CONCURRENCY)))
+    return claimed
+
+
+async def reap_expired_leases() -> int:
+    """
+    Return posts whose claim has expired (their worker crashed or hung while
+    publishing) to the queue. Each expiry counts as a failed attempt, so a
+    post that keeps taking its worker down is backed off and dead-lettered
+    like any other failure. Returns the number of posts reaped.
+    """
     now = datetime.utcnow()
+    expired = await database.scheduled_posts.find(
+        {"status": "running", "lease_expires_at": {"$lt": now}},
+        {"retry_count": 1, "worker_id": 1, "lease_expires_at": 1}
+    ).to_list(None)
+
+    published = {
+        publication["_id"]
+        async for publication in database.publications.find(
+            {"_id": {"$in": [post["_id"] for post in expired]}, "state": {"$ne": "publishing"}},
+            {"_id": 1}
+        )
+    }
+
+    reaped = 0
+    for post in expired:
+        if post["_id"] in published:
+            # Already out, the next delivery only records it as posted
+            update = {
+                "$set": {"status": "scheduled", "next_attempt_at": now},
+                "$unset": {"worker_id": "", "lease_expires_at": ""}
+            }
+        else:
+            update = failure_update(post, LeaseExpiredError("Claim expired before publish finished"), post.get("worker_id"))
+        # Fenced on the expired lease, so a post reclaimed meanwhile is left alone
+        result = await database.scheduled_posts.update_one(
+            {"_id": post["_id"], "status": "running", "lease_expires_at": post["lease_expires_at"]},
+            update
+        )
+        reaped += result.modified_count
+
+    if reaped:
+        scheduler_stats["reaped"] += reaped
+        print(f"Reaped {reaped} scheduled posts with expired claims")
+        wake_scheduler()
+    return reaped
+
+
+async def seconds_until_next_due() -> float:
+    """How long the loop can sleep before the next scheduled post is due"""
+    upcoming = await database.scheduled_posts.find_one(
+        {"status": "scheduled"},
+        {"next_attempt_at": 1},
+        sort=[("next_attempt_at", 1)]
+    )
+    if not upcoming:
+        return SCHEDULER_MAX_SLEEP_SECONDS
+    wait = (upcoming["next_attempt_at"] - datetime.utcnow()).total_seconds()
+    return min(max(wait, 0), SCHEDULER_MAX_SLEEP_SECONDS)
 
-    posts = await database.scheduled_posts.find({
-        "status": "scheduled",
-        "scheduled_time": {"$lte": now}
-    }).to_list(length=10)
 
-    for post in posts:
+async def run_scheduler_loop(worker_id: str = SCHEDULER_WORKER_ID) -> None:
+    """
+    Keep draining due posts batch after batch while there is a backlog, then
+    sleep until the next post or retry is due (or until woken by wake_scheduler).
+    """
+    while not stop_event.is_set():
+        # Clear before looking, so a wake-up during the checks is not lost
+        wake_event.clear()
         try:
-            await database.scheduled_posts.update_one(
-                {"_id": post["_id"]},
-                {"$set": {"status": "running"}}
-            )
-            
-            # Simulate posting (LinkedIn API Later)
-            print("Posting: ", post["content"])
-            
-            await database.scheduled_posts.update_one(
-                {"_id": post["_id"]},
-                {"$set": {"status": "posted"}}
-            )
+            if await process_scheduled_posts(worker_id):
+                continue
+            delay = await seconds_until_next_due()
         except Exception as e:
-            await database.scheduled_posts.update_one(
-                {"_id": post["_id"]},
-                {
-                    "$set": {
-                        "status": "failed",
-                        "last_error": str(e)
-                    },
-                    "$inc": {"retry_count": 1}
-                }
-            )
\ No newline at end of file
+            print(f"Scheduler loop error: {str(e)}")
+            delay = SCHEDULER_ERROR_BACKOFF_SECONDS
+
+        if delay > 0:
+            try:
+                await asyncio.wait_for(wake_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+def wake_scheduler() -> None:
+    """Make the drain loop look for due posts now instead of finishing its sleep"""
+    wake_event.set()
+
+
+def start_scheduler_loop() -> None:
+    global scheduler_task
+    if scheduler_task is None or scheduler_task.done():
+        stop_event.clear()
+        scheduler_task = asyncio.create_task(run_scheduler_loop())
+
+
+async def stop_scheduler_loop() -> None:
+    """
+    Stop claiming new posts and give the ones being published
+    SCHEDULER_STOP_TIMEOUT_SECONDS to finish before cancelling them.
+    """
+    global scheduler_task
+    if scheduler_task is None:
+        return
+    stop_event.set()
+    wake_event.set()
+    try:
+        await asyncio.wait_for(scheduler_task, timeout=SCHEDULER_STOP_TIMEOUT_SECONDS)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        pass
+    scheduler_task = None
+
+
+def lateness_stats() -> dict:
+    """Publish lateness percentiles in seconds over the most recent posts"""
+    if not recent_lateness:
+        return {"samples": 0}
+    ordered = sorted(recent_lateness)
+    pick = lambda q: round(ordered[min(int(q * len(ordered)), len(ordered) - 1)], 3)
+    return {
+        "samples": len(ordered),
+        "p50": pick(0.5),
+        "p95": pick(0.95),
+        "max": round(ordered[-1], 3)
+    }
+
+
+async def queue_stats() -> dict:
+    """Scheduled post counts by status plus this worker's counters"""
+    counts = await database.scheduled_posts.aggregate([
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]).to_list(None)
+    return {
+        "worker_id": SCHEDULER_WORKER_ID,
+        "concurrency": SCHEDULER_CONCURRENCY,
+        "queue": {c["_id"]: c["count"] for c in counts},
+        "lateness_seconds": lateness_stats(),
+        **scheduler_stats
+    }
+
+
+async def requeue_dead_post(post_id, user_email: str) -> Optional[dict]:
+    """Put a dead-lettered post back on the queue with a fresh attempt budget"""
+    post = await database.scheduled_posts.find_one_and_update(
+        {"_id": post_id, "user_email": user_email, "status": "dead"},
+        {
+            "$set": {"status": "scheduled", "next_attempt_at": datetime.utcnow(), "retry_count": 0},
+            "$unset": {"dead_at": ""}
+        },
+        return_document=ReturnDocument.AFTER
+    )
+    if post:
+        wake_scheduler()
+    return post
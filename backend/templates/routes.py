@@ -2,25 +2,37 @@ from fastapi import APIRouter, Depends, HTTPException
 from datetime import datetime
 from auth.dependencies import get_current_user
 from db.mongodb import database
-from templates.schemas import TemplateCreate
+from templates.schemas import TemplateCreate, TemplateResponse, TemplatePage
 from bson import ObjectId
+from typing import Optional
+from utils.pagination import paginate
+from utils.serialization import MongoJSONResponse, field_projection
+from analytics.cache import invalidate as invalidate_analytics
 
 router = APIRouter(prefix="/templates", tags=["Templates"])
 
 
-@router.get("")
-async def get_templates(user: str = Depends(get_current_user)):
-    """Get all templates for the current user"""
+TEMPLATE_FIELDS = set(TemplateResponse.model_fields) - {"id"}
+
+
+@router.get("", response_model=TemplatePage, response_model_exclude_unset=True)
+async def get_templates(
+    user: str = Depends(get_current_user),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """Get the current user's templates, newest first, one page at a time"""
     try:
-        templates = await database.templates.find(
-            {"user_email": user}
-        ).sort("created_at", -1).to_list(100)
-        
-        for template in templates:
-            template["_id"] = str(template["_id"])
-            template["created_at"] = template["created_at"].isoformat()
+        templates, next_cursor = await paginate(
+            database.templates, {"user_email": user}, "created_at", -1,
+            limit=limit, cursor=cursor,
+            projection=field_projection(fields, TEMPLATE_FIELDS, required=["created_at"])
+        )
         
-        return templates
+        return {"items": templates, "next_cursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching templates: {str(e)}")
 
@@ -41,16 +53,15 @@ async def create_template(
             "created_at": datetime.utcnow()
         }
         
-        result = await database.templates.insert_one(template_data)
-        template_data["_id"] = str(result.inserted_id)
-        template_data["created_at"] = template_data["created_at"].isoformat()
+        await database.templates.insert_one(template_data)
+        await invalidate_analytics(user)
         
-        return {"message": "Template created successfully", "template": template_data}
+        return MongoJSONResponse({"message": "Template created successfully", "template": template_data})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating template: {str(e)}")
 
 
-@router.get("/{template_id}")
+@router.get("/{template_id}", response_model=TemplateResponse, response_model_exclude_unset=True)
 async def get_template(
     template_id: str,
     user: str = Depends(get_current_user)
@@ -65,9 +76,6 @@ async def get_template(
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
         
-        template["_id"] = str(template["_id"])
-        template["created_at"] = template["created_at"].isoformat()
-        
         return template
     except HTTPException:
         raise
@@ -89,6 +97,7 @@ async def delete_template(
         
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Template not found")
+        await invalidate_analytics(user)
         
         return {"message": "Template deleted successfully"}
     except HTTPException:
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
+from utils.serialization import MongoModel
 
 
 class TemplateCreate(BaseModel):
@@ -11,12 +12,16 @@ class TemplateCreate(BaseModel):
     description: Optional[str] = None
 
 
-class TemplateResponse(BaseModel):
-    """Schema for template response"""
-    id: str
-    name: str
-    content: str
-    tone: str
+class TemplateResponse(MongoModel):
+    """Schema for template response; fields are optional so `fields=` can trim it"""
+    name: Optional[str] = None
+    content: Optional[str] = None
+    tone: Optional[str] = None
     description: Optional[str] = None
-    user_email: str
-    created_at: str
+    user_email: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+
+class TemplatePage(BaseModel):
+    items: List[TemplateResponse]
+    next_cursor: Optional[str] = None
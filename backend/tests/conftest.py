@@ -0,0 +1,276 @@
+"""
+Shared fixtures. Tests run offline: the LLM is the local stub provider and
+MongoDB is mongomock-motor, so no services or API keys are needed.
+
+    pip install -r requirements-dev.txt
+    python -m pytest
+"""
+import os
+
+# Settings are read at import time, so set them before any app module loads
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("JWT_SECRET", "test")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ["LLM_PROVIDER"] = "stub"
+os.environ["LLM_HEDGE_DELAY_MS"] = "0"
+os.environ["DB_AUTO_MIGRATE"] = "false"
+
+import asyncio
+import functools
+import inspect
+import json
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+import httpx
+import mongomock.aggregate
+import mongomock.collection
+import pytest
+import mongomock_motor
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import DeleteMany, InsertOne, ReplaceOne, UpdateOne
+from pymongo.results import BulkWriteResult
+
+import main  # noqa: F401  (loads every app module so the database fixture can patch them)
+import db.mongodb
+from ai import providers, service
+from ai.resilience import breaker
+from auth.dependencies import get_current_user
+from scheduler import worker
+
+USER = "user@example.com"
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _bulk_write(self, requests, ordered=True, **kwargs):
+    """mongomock's bulk_write does not work with current pymongo; apply the operations one by one"""
+    counts = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nUpserted": 0, "nRemoved": 0, "upserted": []}
+    for request in requests:
+        if isinstance(request, InsertOne):
+            self.insert_one(request._doc)
+            counts["nInserted"] += 1
+        elif isinstance(request, (UpdateOne, ReplaceOne)):
+            write = self.update_one if isinstance(request, UpdateOne) else self.replace_one
+            result = write(request._filter, request._doc, upsert=request._upsert)
+            counts["nMatched"] += result.matched_count
+            counts["nModified"] += result.modified_count
+            if result.upserted_id is not None:
+                counts["nUpserted"] += 1
+        elif isinstance(request, DeleteMany):
+            counts["nRemoved"] += self.delete_many(request._filter).deleted_count
+        else:
+            raise NotImplementedError(type(request).__name__)
+    return BulkWriteResult(counts, acknowledged=True)
+
+
+def _arithmetic_with_round(handle):
+    """mongomock does not know $round (MongoDB rounds half to even, like Python)"""
+    def wrapper(self, operator, values):
+        if operator == "$round":
+            number, places = list(self.parse_many(values))
+            return None if number is None else round(number, places)
+        return handle(self, operator, values)
+    return wrapper
+
+
+def _yielding(method):
+    """
+    mongomock-motor's coroutines never suspend, so concurrent operations would
+    never interleave. Yield to the event loop first, like a network round trip
+    does, so check-then-act races show up in tests.
+    """
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        await asyncio.sleep(0)
+        return await method(*args, **kwargs)
+    return wrapper
+
+
+for _wrapper_class in (mongomock_motor.AsyncMongoMockCollection, mongomock_motor.AsyncCursor,
+                       mongomock_motor.AsyncCommandCursor, mongomock_motor.AsyncLatentCommandCursor):
+    _base = _wrapper_class.__mro__[1]
+    for _name, _method in list(vars(_base).items()):
+        if inspect.iscoroutinefunction(_method):
+            setattr(_base, _name, _yielding(_method))
+
+mongomock.collection.Collection.bulk_write = _bulk_write
+mongomock.aggregate.arithmetic_operators.add("$round")
+mongomock.aggregate._Parser._handle_arithmetic_operator = _arithmetic_with_round(
+    mongomock.aggregate._Parser._handle_arithmetic_operator
+)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """A fresh in-memory database, swapped in for every module that imported the real one"""
+    real_database = db.mongodb.database
+    test_database = AsyncMongoMockClient().test_db
+    for module in list(sys.modules.values()):
+        if not getattr(module, "__file__", None) or not module.__file__.startswith(BACKEND_DIR):
+            continue
+        for name in ("database", "db"):
+            if getattr(module, name, None) is real_database:
+                monkeypatch.setattr(module, name, test_database)
+    return test_database
+
+
+@pytest.fixture
+async def client(database):
+    """HTTP client for the app, signed in as USER"""
+    main.app.dependency_overrides[get_current_user] = lambda: USER
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http_client:
+        yield http_client
+    main.app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def restore_breaker(monkeypatch):
+    """Restore the shared circuit breaker after the test"""
+    for attribute in ("state", "consecutive_failures", "opened_at", "trial_in_flight", "failure_threshold"):
+        monkeypatch.setattr(breaker, attribute, getattr(breaker, attribute))
+
+
+@pytest.fixture
+def fast_stub(monkeypatch, restore_breaker):
+    """Stub provider that answers and streams without delay"""
+    monkeypatch.setattr(providers, "STUB_LATENCY_MS", 0)
+    monkeypatch.setattr(providers, "STUB_STREAM_CHUNK_DELAY_MS", 0)
+
+
+async def quota_used(database) -> int:
+    """Generations charged to USER today"""
+    record = await database.ai_usage.find_one({"email": USER})
+    return record["count"] if record else 0
+
+
+class FakeGroq:
+    """
+    OpenAI-compatible chat completions server on a local port, run by uvicorn
+    in its own thread so a blocking client would stall the test's event loop.
+    Completions answer after `latency` seconds; streams send their first
+    chunk after `latency`, then one word every `chunk_delay` seconds.
+    """
+
+    WORDS = ("Small, consistent steps beat big plans that never ship. " * 4).split()
+
+    def __init__(self, latency: float = 0.3, chunk_delay: float = 0.02):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.requests = 0
+        self.streams_finished = 0
+        self.streams_abandoned = 0
+        self.app = FastAPI()
+        self.app.post("/openai/v1/chat/completions")(self.chat_completions)
+
+    async def chat_completions(self, request: Request):
+        body = await request.json()
+        self.requests += 1
+        if body.get("stream"):
+            return StreamingResponse(self.chunks(body["model"]), media_type="text/event-stream")
+        await asyncio.sleep(self.latency)
+        return {
+            "id": "fake", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": " ".join(self.WORDS)}}]
+        }
+
+    async def chunks(self, model: str):
+        finished = False
+        try:
+            await asyncio.sleep(self.latency)
+            for i, word in enumerate(self.WORDS):
+                if i:
+                    await asyncio.sleep(self.chunk_delay)
+                chunk = {"id": "fake", "object": "chat.completion.chunk", "created": 0, "model": model,
+                         "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+            finished = True
+        finally:
+            if finished:
+                self.streams_finished += 1
+            else:
+                self.streams_abandoned += 1
+
+
+@pytest.fixture
+async def fake_groq(monkeypatch):
+    """
+    A FakeGroq server with the app's provider swapped for a real
+    GroqProvider (AsyncGroq over HTTP) pointed at it via GROQ_BASE_URL
+    """
+    fake = FakeGroq()
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(fake.app, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not server.started:
+        assert time.monotonic() < deadline, "fake Groq server did not start"
+        time.sleep(0.01)
+
+    monkeypatch.setattr(providers, "GROQ_BASE_URL", f"http://127.0.0.1:{sock.getsockname()[1]}")
+    fake.provider = providers.GroqProvider()
+    monkeypatch.setattr(service, "provider", fake.provider)
+    # A semaphore that has been waited on is bound to that test's event loop
+    monkeypatch.setattr(service, "upstream_semaphore", asyncio.Semaphore(service.GROQ_MAX_CONCURRENCY))
+    yield fake
+
+    await fake.provider.close()
+    server.should_exit = True
+    thread.join(timeout=5)
+    sock.close()
+
+
+class PublishLog(Counter):
+    """
+    Publishes that took effect, by post content. Like the real API, a repeat
+    of an idempotency key is dropped; those are counted in `repeats`.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.keys = set()
+        self.repeats = Counter()
+
+
+@pytest.fixture
+def published(database, monkeypatch):
+    """Fresh worker state, with publish_post logging the posts it publishes"""
+    monkeypatch.setattr(worker, "scheduler_stats", dict.fromkeys(worker.scheduler_stats, 0))
+    monkeypatch.setattr(worker, "stop_event", asyncio.Event())
+    monkeypatch.setattr(worker, "wake_event", asyncio.Event())
+    log = PublishLog()
+
+    async def idempotent_publish(post, idempotency_key):
+        await asyncio.sleep(0.01)
+        if idempotency_key in log.keys:
+            log.repeats[post["content"]] += 1
+        else:
+            log.keys.add(idempotency_key)
+            log[post["content"]] += 1
+
+    monkeypatch.setattr(worker, "publish_post", idempotent_publish)
+    return log
+
+
+async def wait_until(condition, timeout: float = 5.0) -> None:
+    """Poll until condition() is true, failing the test after `timeout` seconds"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            pytest.fail("Timed out waiting for condition")
+        await asyncio.sleep(0.01)
@@ -0,0 +1,72 @@
+import random
+from datetime import datetime, timedelta
+import pytest
+from analytics.engagement import engagement_score
+from analytics.rollups import rebuild_rollups
+from tests.conftest import USER
+
+pytestmark = pytest.mark.anyio
+
+
+def make_posts(count: int, days: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    posts = []
+    for i in range(count):
+        views, clicks, shares = rng.randint(0, 500), rng.randint(0, 40), rng.randint(0, 10)
+        posts.append({
+            "user_email": USER, "content": f"Post {i}", "tone": rng.choice(["casual", "professional"]),
+            "created_at": now - timedelta(days=rng.randint(0, days - 1), minutes=rng.randint(0, 600)),
+            "views": views, "clicks": clicks, "shares": shares,
+            "engagement_score": engagement_score(views, clicks, shares)
+        })
+    return posts
+
+
+def expected_overview(posts: list, days: int) -> dict:
+    """The per-post Python computation the endpoint used to run, over whole UTC days"""
+    first_day = (datetime.utcnow() - timedelta(days=days)).date()
+    posts = [p for p in posts if p["created_at"].date() >= first_day]
+    trend = {}
+    for post in posts:
+        day = trend.setdefault(post["created_at"].date().isoformat(), [0, 0])
+        day[0] += post["engagement_score"]
+        day[1] += 1
+    return {
+        "total_posts": len(posts),
+        "avg_engagement": round(sum(p["engagement_score"] for p in posts) / len(posts), 2),
+        "total_views": sum(p["views"] for p in posts),
+        "total_clicks": sum(p["clicks"] for p in posts),
+        "total_shares": sum(p["shares"] for p in posts),
+        "engagement_trend": [
+            {"date": date, "score": round(score / count, 2)} for date, (score, count) in sorted(trend.items())
+        ]
+    }
+
+
+async def overview(client, days: int) -> dict:
+    response = await client.get("/analytics/overview", params={"days": days})
+    assert response.status_code == 200
+    return response.json()
+
+
+async def test_overview_matches_per_post_computation(client, database):
+    posts = make_posts(40, days=10) + make_posts(5, days=5, seed=8)
+    # Outside the 30-day window
+    posts.append({**posts[0], "content": "Old", "created_at": datetime.utcnow() - timedelta(days=45)})
+    await database.posts.insert_many([dict(p) for p in posts])
+    await rebuild_rollups(USER)
+
+    assert await overview(client, 30) == expected_overview(posts, 30)
+    assert await overview(client, 3) == expected_overview(posts, 3)
+
+
+async def test_overview_counts_every_post_past_1000(client, database):
+    posts = make_posts(1500, days=20)
+    await database.posts.insert_many([dict(p) for p in posts])
+    await rebuild_rollups(USER)
+
+    result = await overview(client, 30)
+
+    assert result == expected_overview(posts, 30)
+    assert result["total_posts"] == 1500
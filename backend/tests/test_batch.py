@@ -0,0 +1,61 @@
+import asyncio
+import time
+import pytest
+from ai import providers, rate_limit, service, tokens
+from tests.conftest import quota_used
+
+pytestmark = [pytest.mark.anyio, pytest.mark.usefixtures("fast_stub")]
+
+
+async def test_results_come_back_in_input_order(client, database):
+    topics = [f"Topic {i}" for i in range(4)]
+    response = await client.post("/ai/generate/batch", json={"items": [{"topic": t} for t in topics]})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert all(topic in r["generated_post"] for topic, r in zip(topics, results))
+    assert await quota_used(database) == 4
+
+
+async def test_batch_takes_about_one_items_latency(client, database, monkeypatch):
+    monkeypatch.setattr(providers, "STUB_LATENCY_MS", 200)
+    monkeypatch.setitem(rate_limit.PLAN_LIMITS, "free", 1000)
+    # A semaphore that has been waited on is bound to that test's event loop
+    monkeypatch.setattr(service, "upstream_semaphore", asyncio.Semaphore(service.GROQ_MAX_CONCURRENCY))
+    items = [{"topic": f"Topic {i}"} for i in range(service.GROQ_MAX_CONCURRENCY)]
+
+    started = time.perf_counter()
+    response = await client.post("/ai/generate/batch", json={"items": items})
+    elapsed = time.perf_counter() - started
+
+    assert response.json()["succeeded"] == len(items)
+    assert elapsed < 0.2 * 1.5
+
+
+async def test_invalid_items_fail_alone_and_are_not_charged(client, database, monkeypatch):
+    monkeypatch.setattr(tokens, "TOPIC_OVERFLOW", "reject")
+    response = await client.post("/ai/generate/batch", json={"items": [
+        {"topic": "Remote work"},
+        {"topic": "Hiring", "length": "epic"},
+        {"topic": "word " * 1000},
+        {"topic": "Leadership"},
+    ]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["status"] for r in body["results"]] == ["ok", "error", "error", "ok"]
+    assert "Invalid length" in body["results"][1]["detail"]
+    assert (body["succeeded"], body["failed"]) == (2, 2)
+    assert await quota_used(database) == 2
+
+
+async def test_failed_generations_are_refunded(client, database, monkeypatch):
+    monkeypatch.setattr(providers, "STUB_ERROR_RATE", 1.0)
+    monkeypatch.setattr("ai.resilience.LLM_MAX_ATTEMPTS", 1)
+    monkeypatch.setattr("ai.resilience.breaker.failure_threshold", 100)
+    monkeypatch.setattr("ai.resilience.breaker.consecutive_failures", 0)
+    response = await client.post("/ai/generate/batch", json={"items": [{"topic": "A"}, {"topic": "B"}]})
+
+    assert response.json()["failed"] == 2
+    assert await quota_used(database) == 0
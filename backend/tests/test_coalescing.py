@@ -0,0 +1,55 @@
+import asyncio
+import pytest
+from ai import providers, resilience, service
+from tests.conftest import USER
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def provider_calls(monkeypatch):
+    """Count provider calls; hedging is off so each generation makes exactly one"""
+    monkeypatch.setattr(resilience, "LLM_HEDGE_DELAY_MS", 0)
+    monkeypatch.setattr(providers, "STUB_LATENCY_MS", 100)
+    calls = []
+    complete = service.provider.complete
+
+    async def counting_complete(*args, **kwargs):
+        calls.append(kwargs)
+        return await complete(*args, **kwargs)
+
+    monkeypatch.setattr(service.provider, "complete", counting_complete)
+    return calls
+
+
+async def test_identical_concurrent_generations_make_one_provider_call(provider_calls):
+    results = await asyncio.gather(*(
+        service.generate_linkedin_post(topic="Remote work", dedupe_key="user:remote-work")
+        for _ in range(10)
+    ))
+
+    assert len(provider_calls) == 1
+    assert len(set(results)) == 1
+    assert not service.generation_in_flight("user:remote-work")
+
+
+async def test_different_dedupe_keys_are_not_shared(provider_calls):
+    await asyncio.gather(
+        service.generate_linkedin_post(topic="Remote work", dedupe_key="a:remote-work"),
+        service.generate_linkedin_post(topic="Remote work", dedupe_key="b:remote-work"),
+    )
+
+    assert len(provider_calls) == 2
+
+
+async def test_coalesced_requests_use_quota_once(client, database, provider_calls):
+    responses = await asyncio.gather(*(
+        client.post("/ai/generate", json={"topic": "Remote work"}) for _ in range(5)
+    ))
+
+    assert [r.status_code for r in responses] == [200] * 5
+    assert len({r.json()["generated_post"] for r in responses}) == 1
+    assert len(provider_calls) == 1
+
+    usage = await database.ai_usage.find_one({"email": USER})
+    assert usage["count"] == 1
@@ -0,0 +1,61 @@
+import asyncio
+import itertools
+from datetime import datetime
+import pytest
+from analytics.engagement import ENGAGEMENT_SCORE_EXPR, engagement_score, engagement_update, track_engagement
+from analytics.rollups import record_change
+from tests.conftest import USER
+
+pytestmark = pytest.mark.anyio
+
+GRID = list(itertools.product([0, 1, 3, 7, 50, 999], [0, 1, 4, 33], [0, 1, 2, 49]))
+
+
+async def test_score_expression_matches_python(database):
+    await database.posts.insert_many([
+        {"_id": i, "views": views, "clicks": clicks, "shares": shares}
+        for i, (views, clicks, shares) in enumerate(GRID)
+    ])
+
+    scores = await database.posts.aggregate([
+        {"$project": {"score": ENGAGEMENT_SCORE_EXPR}}
+    ]).to_list(None)
+
+    for record in scores:
+        assert record["score"] == engagement_score(*GRID[record["_id"]])
+
+
+async def test_update_pipeline_keeps_score_in_step(database):
+    await database.posts.insert_one({"_id": 1})
+
+    for views, clicks, shares in GRID[:20]:
+        await database.posts.update_one({"_id": 1}, engagement_update({"views": views, "clicks": clicks, "shares": shares}))
+
+    post = await database.posts.find_one({"_id": 1})
+    assert post["engagement_score"] == engagement_score(post["views"], post["clicks"], post["shares"])
+
+
+async def test_concurrent_events_leave_score_matching_counters(database):
+    post = {"user_email": USER, "content": "Post", "tone": "casual", "created_at": datetime.utcnow()}
+    result = await database.posts.insert_one(post)
+    await record_change(None, post)
+    post_id = str(result.inserted_id)
+
+    events = [{"views": 1}] * 120 + [{"clicks": 1}] * 30 + [{"shares": 1}] * 10
+    await asyncio.gather(*(track_engagement(post_id, USER, increments) for increments in events))
+
+    post = await database.posts.find_one({"_id": result.inserted_id})
+    assert (post["views"], post["clicks"], post["shares"]) == (120, 30, 10)
+    assert post["engagement_score"] == engagement_score(120, 30, 10)
+
+    # Each event's rollup delta was taken from the state it actually updated
+    rollup = await database.analytics_daily.find_one({"user_email": USER})
+    assert (rollup["views"], rollup["clicks"], rollup["shares"]) == (120, 30, 10)
+    assert rollup["score_sum"] == pytest.approx(post["engagement_score"])
+
+
+async def test_events_for_another_users_post_are_ignored(database):
+    result = await database.posts.insert_one({"user_email": USER, "created_at": datetime.utcnow()})
+
+    assert await track_engagement(str(result.inserted_id), "someone@example.com", {"views": 1}) is None
+    assert "views" not in await database.posts.find_one({"_id": result.inserted_id})
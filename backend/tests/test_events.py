@@ -0,0 +1,147 @@
+import asyncio
+from datetime import datetime
+import mongomock.collection
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from analytics.events import EventBuffer
+from analytics.rollups import rebuild_rollups, record_change
+from db.indexes import INDEXES
+from tests.conftest import USER
+
+pytestmark = pytest.mark.anyio
+
+
+async def create_posts(database, count: int) -> list:
+    post_ids = []
+    for i in range(count):
+        post = {"user_email": USER, "content": f"Post {i}", "tone": "casual", "created_at": datetime.utcnow()}
+        result = await database.posts.insert_one(post)
+        await record_change(None, post)
+        post_ids.append(str(result.inserted_id))
+    return post_ids
+
+
+async def rollups(database) -> list:
+    days = await database.analytics_daily.find({}, {"_id": 0}).sort("date", 1).to_list(None)
+    # Incremental updates leave out counters that are still zero
+    return [
+        {**{field: 0 for field in ("views", "clicks", "shares", "favorites")}, **day,
+         "score_sum": round(day["score_sum"], 6)}
+        for day in days
+    ]
+
+
+async def counters(database, post_id: str) -> tuple:
+    post = await database.posts.find_one({"_id": ObjectId(post_id)})
+    return post.get("views", 0), post.get("clicks", 0), post.get("shares", 0)
+
+
+async def test_events_are_coalesced_per_post(database):
+    post_ids = await create_posts(database, 2)
+    buffer = EventBuffer(flush_size=100, max_posts=100)
+
+    for _ in range(5):
+        buffer.add(USER, post_ids[0], "views")
+    buffer.add(USER, post_ids[0], "shares")
+    buffer.add(USER, post_ids[1], "clicks")
+
+    assert buffer.metrics()["buffered_posts"] == 2
+    assert await buffer.flush() == 7
+    assert await counters(database, post_ids[0]) == (5, 0, 1)
+    assert await counters(database, post_ids[1]) == (0, 1, 0)
+
+
+async def test_full_buffer_drops_new_posts(database):
+    buffer = EventBuffer(flush_size=100, max_posts=1)
+
+    assert buffer.add(USER, "a" * 24, "views")
+    assert buffer.add(USER, "a" * 24, "views")
+    assert not buffer.add(USER, "b" * 24, "views")
+    assert buffer.stats["events_dropped"] == 1
+
+
+async def test_partial_bulk_failure_only_retries_failed_posts(database, monkeypatch):
+    post_ids = await create_posts(database, 3)
+    buffer = EventBuffer(flush_size=100, max_posts=100)
+    for post_id in post_ids:
+        buffer.add(USER, post_id, "views", 2)
+
+    bulk_write = mongomock.collection.Collection.bulk_write
+
+    def fail_second_update(self, requests, ordered=True, **kwargs):
+        # Like an unordered bulk write: the others are applied, index 1 is reported
+        if self.name == "posts":
+            requests = list(requests)
+            bulk_write(self, requests[:1] + requests[2:], ordered=ordered)
+            raise BulkWriteError({"writeErrors": [{"index": 1, "code": 11000, "errmsg": "failed"}]})
+        return bulk_write(self, requests, ordered=ordered, **kwargs)
+
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", fail_second_update)
+    assert await buffer.flush() == 4
+    assert list(buffer.pending) == [(USER, post_ids[1])]
+
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", bulk_write)
+    assert await buffer.flush() == 2
+    assert [await counters(database, post_id) for post_id in post_ids] == [(2, 0, 0)] * 3
+    assert buffer.stats["events_accepted"] == buffer.stats["events_flushed"] == 6
+
+
+async def test_failed_flush_keeps_every_event(database, monkeypatch):
+    post_ids = await create_posts(database, 2)
+    buffer = EventBuffer(flush_size=100, max_posts=100)
+    for post_id in post_ids:
+        buffer.add(USER, post_id, "clicks")
+
+    def unavailable(self, requests, ordered=True, **kwargs):
+        raise ConnectionError("database unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(mongomock.collection.Collection, "bulk_write", unavailable)
+        assert await buffer.flush() == 0
+
+    assert await buffer.flush() == 2
+    assert [await counters(database, post_id) for post_id in post_ids] == [(0, 1, 0)] * 2
+
+
+async def test_flush_updates_rollups_without_losing_concurrent_writes(database):
+    post_ids = await create_posts(database, 3)
+    buffer = EventBuffer(flush_size=100, max_posts=100)
+    for _ in range(40):
+        buffer.add(USER, post_ids[0], "views")
+    buffer.add(USER, post_ids[1], "shares", 3)
+
+    # New posts on the same day land while the flush is running
+    await asyncio.gather(buffer.flush(), create_posts(database, 2))
+
+    incremental = await rollups(database)
+    await rebuild_rollups(USER)
+    assert incremental == await rollups(database)
+    assert incremental[0]["posts"] == 5
+    assert incremental[0]["views"] == 40
+
+
+async def test_rebuild_alongside_new_posts_never_drops_a_day(database):
+    await database.analytics_daily.create_indexes(INDEXES["analytics_daily"])
+    await create_posts(database, 5)
+    seen = []
+
+    async def count_days():
+        for _ in range(20):
+            seen.append(await database.analytics_daily.count_documents({"user_email": USER}))
+
+    await asyncio.gather(rebuild_rollups(), create_posts(database, 5), count_days())
+
+    assert 0 not in seen
+    await rebuild_rollups(USER)
+    assert [day["posts"] for day in await rollups(database)] == [10]
+
+
+async def test_rebuild_removes_days_without_posts(database):
+    await create_posts(database, 2)
+    await database.analytics_daily.insert_one({"user_email": USER, "date": "2020-01-01", "posts": 3})
+    await database.analytics_daily.insert_one({"user_email": "gone@example.com", "date": "2020-01-01", "posts": 1})
+
+    assert await rebuild_rollups() == 1
+
+    assert [day["posts"] for day in await rollups(database)] == [2]
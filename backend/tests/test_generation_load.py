@@ -0,0 +1,48 @@
+import asyncio
+import statistics
+import time
+from datetime import datetime
+import pytest
+from ai import rate_limit, service
+from tests.conftest import USER, wait_until
+
+pytestmark = pytest.mark.anyio
+
+
+async def listing_latencies(client, samples: int) -> list:
+    latencies = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        response = await client.get("/posts/all", params={"limit": 20})
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200
+    return latencies
+
+
+async def test_post_listing_stays_fast_while_generation_is_saturated(client, database, fake_groq, monkeypatch):
+    monkeypatch.setitem(rate_limit.PLAN_LIMITS, "free", 1000)
+    await database.posts.insert_many([
+        {"user_email": USER, "content": f"Post {i}", "tone": "professional", "created_at": datetime.utcnow()}
+        for i in range(50)
+    ])
+
+    baseline = await listing_latencies(client, 20)
+
+    # Several times more generations than upstream slots, all waiting on the
+    # slow Groq server. A blocking client would stall the loop for each call.
+    generations = [
+        asyncio.ensure_future(client.post("/ai/generate", json={"topic": f"Topic {i}"}))
+        for i in range(service.GROQ_MAX_CONCURRENCY * 5)
+    ]
+    await wait_until(lambda: fake_groq.requests >= service.GROQ_MAX_CONCURRENCY)
+
+    during = await listing_latencies(client, 20)
+    assert not all(g.done() for g in generations)
+
+    responses = await asyncio.gather(*generations)
+    assert all(r.status_code == 200 for r in responses)
+    assert fake_groq.requests == service.GROQ_MAX_CONCURRENCY * 5
+
+    # Listing never waits behind a generation, and its typical latency is unchanged
+    assert max(during) < fake_groq.latency
+    assert statistics.median(during) < max(statistics.median(baseline) * 5, 0.05)
@@ -0,0 +1,74 @@
+import json
+import pytest
+from posts import routes
+from tests.conftest import USER
+
+pytestmark = pytest.mark.anyio
+
+
+async def rollup_totals(database) -> tuple:
+    days = await database.analytics_daily.find({"user_email": USER}).to_list(None)
+    tones = {}
+    for day in days:
+        for tone, count in day.get("tones", {}).items():
+            tones[tone] = tones.get(tone, 0) + count
+    return sum(day["posts"] for day in days), tones
+
+
+async def test_json_array_import_reports_invalid_rows(client, database):
+    rows = [
+        {"content": "First", "tone": "casual"},
+        {"content": "No tone"},
+        {"content": "Second", "tone": "professional"},
+        {"content": 42, "tone": "casual"},
+        "not an object",
+        {"content": "Third", "tone": "casual"},
+    ]
+
+    response = await client.post("/posts/import", json=rows)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["inserted"], body["failed"]) == (3, 3)
+    assert [e["row"] for e in body["errors"]] == [1, 3, 4]
+    assert "tone" in body["errors"][0]["error"]
+    assert await database.posts.count_documents({"user_email": USER}) == 3
+    assert await rollup_totals(database) == (3, {"casual": 2, "professional": 1})
+
+
+async def test_ndjson_import_mixes_valid_rows_bad_json_and_schema_errors(client, database, monkeypatch):
+    # Several chunks, so rows are numbered across chunk boundaries
+    monkeypatch.setattr(routes, "IMPORT_CHUNK_SIZE", 2)
+    lines = [
+        json.dumps({"content": "Post 0", "tone": "casual"}),
+        "{not json",
+        json.dumps({"content": "Post 2", "tone": "casual"}),
+        "",
+        json.dumps({"tone": "casual"}),
+        json.dumps({"content": "Post 4", "tone": "professional"}),
+        json.dumps({"content": "Post 5", "tone": "professional"}),
+        json.dumps({"content": "Post 6", "tone": "casual"}),
+    ]
+    # The last line has no trailing newline
+    body = "\n".join(lines).encode()
+
+    response = await client.post(
+        "/posts/import", content=body, headers={"Content-Type": "application/x-ndjson"}
+    )
+
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["inserted"], result["failed"]) == (5, 2)
+    assert [e["row"] for e in result["errors"]] == [1, 3]
+    assert result["errors"][0]["error"].startswith("Invalid JSON")
+    assert "content" in result["errors"][1]["error"]
+    contents = sorted([p["content"] async for p in database.posts.find({"user_email": USER})])
+    assert contents == ["Post 0", "Post 2", "Post 4", "Post 5", "Post 6"]
+    assert await rollup_totals(database) == (5, {"casual": 3, "professional": 2})
+
+
+async def test_body_that_is_not_an_array_is_rejected(client, database):
+    response = await client.post("/posts/import", json={"content": "Post", "tone": "casual"})
+
+    assert response.status_code == 400
+    assert await database.posts.count_documents({}) == 0
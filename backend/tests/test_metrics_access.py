@@ -0,0 +1,23 @@
+import pytest
+from auth import dependencies
+from tests.conftest import USER
+
+pytestmark = pytest.mark.anyio
+
+METRICS_ENDPOINTS = ["/ai/metrics", "/analytics/metrics", "/scheduler/metrics"]
+
+
+@pytest.mark.parametrize("path", METRICS_ENDPOINTS)
+async def test_metrics_are_hidden_from_regular_users(client, path):
+    response = await client.get(path)
+
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize("path", METRICS_ENDPOINTS)
+async def test_ops_users_can_read_metrics(client, monkeypatch, path):
+    monkeypatch.setattr(dependencies, "OPS_EMAILS", {USER})
+
+    response = await client.get(path)
+
+    assert response.status_code == 200
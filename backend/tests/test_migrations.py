@@ -0,0 +1,46 @@
+import asyncio
+from collections import Counter
+import pytest
+from db import indexes
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def applied(database, monkeypatch):
+    """Replace the migrations with slow ones that count how often they run"""
+    calls = Counter()
+
+    def migration(migration_id: str):
+        async def apply():
+            calls[migration_id] += 1
+            await asyncio.sleep(0.05)
+        return apply
+
+    monkeypatch.setattr(indexes, "MIGRATIONS", [(f"000{i}", migration(f"000{i}")) for i in range(1, 4)])
+    return calls
+
+
+async def test_concurrent_starts_apply_each_migration_once(database, applied):
+    await asyncio.gather(*(indexes.run_migrations() for _ in range(4)))
+    await indexes.run_migrations()
+
+    assert applied == {"0001": 1, "0002": 1, "0003": 1}
+    records = await database.migrations.find({}).to_list(None)
+    assert {r["state"] for r in records} == {"applied"}
+
+
+async def test_failed_migration_is_retried_on_the_next_start(database, applied, monkeypatch):
+    async def broken():
+        raise RuntimeError("migration failed")
+
+    migrations = list(indexes.MIGRATIONS)
+    monkeypatch.setattr(indexes, "MIGRATIONS", [migrations[0], ("0002", broken), migrations[2]])
+    with pytest.raises(RuntimeError):
+        await indexes.run_migrations()
+    assert await database.migrations.find_one({"_id": "0002"}) is None
+
+    monkeypatch.setattr(indexes, "MIGRATIONS", migrations)
+    await indexes.run_migrations()
+    assert applied == {"0001": 1, "0002": 1, "0003": 1}
+    assert await database.migrations.count_documents({"state": "applied"}) == 3
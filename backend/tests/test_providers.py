@@ -0,0 +1,27 @@
+import pytest
+from ai.providers import LLMProvider, StubProvider
+
+pytestmark = pytest.mark.anyio
+
+MESSAGES = [{"role": "user", "content": "Topic: Remote work"}]
+
+
+def test_incomplete_provider_fails_when_constructed():
+    class CompleteOnly(LLMProvider):
+        async def complete(self, messages, temperature, max_tokens):
+            return ""
+
+    with pytest.raises(TypeError):
+        CompleteOnly()
+
+
+async def test_stub_stream_matches_complete(monkeypatch):
+    monkeypatch.setattr("ai.providers.STUB_LATENCY_MS", 0)
+    monkeypatch.setattr("ai.providers.STUB_STREAM_CHUNK_DELAY_MS", 0)
+    provider = StubProvider()
+
+    text = await provider.complete(MESSAGES, temperature=0.7, max_tokens=320)
+    streamed = "".join([delta async for delta in provider.stream(MESSAGES, temperature=0.7, max_tokens=320)])
+
+    assert "Remote work" in text
+    assert streamed == text
@@ -0,0 +1,72 @@
+import asyncio
+from datetime import date
+import pytest
+from fastapi import HTTPException
+from ai import rate_limit
+from tests.conftest import USER
+
+pytestmark = pytest.mark.anyio
+
+CONCURRENT_REQUESTS = 100
+
+
+@pytest.fixture(params=["daily", "sliding", "local"])
+def mode(request, database, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_MODE", "sliding" if request.param == "sliding" else "daily")
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_LOCAL", request.param == "local")
+    monkeypatch.setattr(rate_limit, "local_buckets", {})
+    return request.param
+
+
+async def charge(count: int = 1) -> bool:
+    try:
+        await rate_limit.check_rate_limit(USER, count)
+        return True
+    except HTTPException as e:
+        assert e.status_code == 429
+        return False
+
+
+async def recorded_usage(database, mode: str) -> int:
+    if mode == "sliding":
+        record = await database.ai_usage.find_one({"_id": f"{USER}_sliding"})
+        return len(record["hits"])
+    if mode == "local":
+        await rate_limit.sync_rate_limit_counters()
+    record = await database.ai_usage.find_one({"_id": f"{USER}_{date.today()}"})
+    return record["count"]
+
+
+async def test_concurrent_requests_admit_exactly_the_limit(mode, database):
+    admitted = await asyncio.gather(*(charge() for _ in range(CONCURRENT_REQUESTS)))
+
+    assert sum(admitted) == rate_limit.MAX_DAILY_POSTS
+    assert await recorded_usage(database, mode) == rate_limit.MAX_DAILY_POSTS
+
+
+async def test_batch_charge_is_all_or_nothing(mode, database):
+    assert await charge(3)
+    assert not await charge(3)
+    assert await charge(2)
+    assert await recorded_usage(database, mode) == rate_limit.MAX_DAILY_POSTS
+
+
+async def test_refund_frees_quota(mode, database):
+    if mode == "sliding":
+        pytest.skip("mongomock cannot evaluate $slice with a computed length")
+    assert await charge(rate_limit.MAX_DAILY_POSTS)
+    await rate_limit.refund_rate_limit(USER, 2)
+
+    admitted = await asyncio.gather(*(charge() for _ in range(10)))
+    assert sum(admitted) == 2
+
+
+async def test_plan_limit_applies(mode, database, monkeypatch):
+    monkeypatch.setitem(rate_limit.PLAN_LIMITS, "pro", 20)
+    rate_limit.plan_cache.delete(USER)
+    await database.users.insert_one({"email": USER, "plan": "pro"})
+
+    admitted = await asyncio.gather(*(charge() for _ in range(CONCURRENT_REQUESTS)))
+    rate_limit.plan_cache.delete(USER)
+
+    assert sum(admitted) == 20
@@ -0,0 +1,38 @@
+import asyncio
+import pytest
+from ai import providers, resilience, service
+from tests.conftest import quota_used
+
+pytestmark = [pytest.mark.anyio, pytest.mark.usefixtures("restore_breaker")]
+
+
+async def test_saturated_healthy_provider_keeps_breaker_closed(monkeypatch):
+    monkeypatch.setattr(providers, "STUB_LATENCY_MS", 300)
+    monkeypatch.setattr(resilience, "LLM_ATTEMPT_TIMEOUT_SECONDS", 0.5)
+    monkeypatch.setattr(resilience, "resilience_stats", dict.fromkeys(resilience.resilience_stats, 0))
+    # A semaphore that has been waited on is bound to that test's event loop
+    monkeypatch.setattr(service, "upstream_semaphore", asyncio.Semaphore(service.GROQ_MAX_CONCURRENCY))
+
+    # Four times the upstream slots: the last ones queue locally for ~0.9s,
+    # longer than the attempt timeout, but every provider call takes 0.3s
+    results = await asyncio.gather(*(
+        service.generate_linkedin_post(topic=f"Topic {i}")
+        for i in range(service.GROQ_MAX_CONCURRENCY * 4)
+    ))
+
+    assert all(results)
+    assert resilience.breaker.state == "closed"
+    assert resilience.breaker.consecutive_failures == 0
+    assert resilience.resilience_stats["timeouts"] == 0
+
+
+async def test_failed_generation_is_refunded(client, database, monkeypatch):
+    monkeypatch.setattr(providers, "STUB_LATENCY_MS", 0)
+    monkeypatch.setattr(providers, "STUB_ERROR_RATE", 1.0)
+    monkeypatch.setattr(resilience, "LLM_MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(resilience.breaker, "failure_threshold", 100)
+
+    response = await client.post("/ai/generate", json={"topic": "Remote work"})
+
+    assert response.status_code == 500
+    assert await quota_used(database) == 0
@@ -0,0 +1,71 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from scheduler import worker
+from tests.conftest import USER
+
+pytestmark = pytest.mark.anyio
+
+
+async def schedule_posts(database, count: int, due_in: timedelta = timedelta(0)) -> None:
+    due = datetime.utcnow() + due_in
+    await database.scheduled_posts.insert_many([
+        {"user_email": USER, "content": f"Post {i}", "status": "scheduled",
+         "scheduled_time": due, "next_attempt_at": due, "retry_count": 0}
+        for i in range(count)
+    ])
+
+
+async def drain(worker_id: str) -> None:
+    while await worker.process_scheduled_posts(worker_id):
+        pass
+
+
+async def test_concurrent_workers_publish_each_post_once(database, published):
+    await schedule_posts(database, 200)
+
+    await asyncio.gather(*(drain(f"worker-{i}") for i in range(4)))
+
+    assert len(published) == 200
+    assert set(published.values()) == {1}
+    assert not published.repeats
+    assert await database.scheduled_posts.count_documents({"status": "posted"}) == 200
+    assert worker.scheduler_stats["claimed"] == 200
+    assert worker.scheduler_stats["lost_claims"] == 0
+
+
+async def test_claims_are_spread_across_workers(database, published):
+    await schedule_posts(database, 40)
+
+    async def claim_one_at_a_time(worker_id: str) -> list:
+        claimed = []
+        while post := await worker.claim_next_post(worker_id):
+            claimed.append(post["_id"])
+            await worker.process_claimed_post(post, worker_id)
+        return claimed
+
+    claims = await asyncio.gather(*(claim_one_at_a_time(f"worker-{i}") for i in range(4)))
+
+    all_claims = [post_id for claimed in claims for post_id in claimed]
+    assert len(all_claims) == len(set(all_claims)) == 40
+    assert all(claimed for claimed in claims)
+
+
+async def test_posts_are_not_claimed_before_they_are_due(database, published):
+    await schedule_posts(database, 5, due_in=timedelta(hours=1))
+
+    assert await worker.claim_next_post("worker-0") is None
+    assert not published
+
+
+async def test_stale_worker_cannot_overwrite_a_reassigned_post(database, published):
+    await schedule_posts(database, 1)
+    post = await worker.claim_next_post("worker-a")
+    # The claim moved to another worker meanwhile (e.g. after its lease expired)
+    await database.scheduled_posts.update_one({"_id": post["_id"]}, {"$set": {"worker_id": "worker-b"}})
+
+    await worker.process_claimed_post(post, "worker-a")
+
+    stored = await database.scheduled_posts.find_one({"_id": post["_id"]})
+    assert (stored["status"], stored["worker_id"]) == ("running", "worker-b")
+    assert worker.scheduler_stats["lost_claims"] == 1
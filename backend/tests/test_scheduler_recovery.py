@@ -0,0 +1,123 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from scheduler import worker
+from tests.conftest import USER, wait_until
+
+pytestmark = pytest.mark.anyio
+
+
+async def running_post(database, retry_count: int = 0, expired: bool = True) -> dict:
+    now = datetime.utcnow()
+    post = {
+        "user_email": USER, "content": "Stuck", "status": "running", "worker_id": "crashed",
+        "scheduled_time": now, "next_attempt_at": now, "retry_count": retry_count,
+        "lease_expires_at": now + timedelta(seconds=-1 if expired else 300)
+    }
+    await database.scheduled_posts.insert_one(post)
+    return post
+
+
+async def test_expired_claim_counts_as_a_failed_attempt(database, published):
+    post = await running_post(database)
+
+    assert await worker.reap_expired_leases() == 1
+
+    stored = await database.scheduled_posts.find_one({"_id": post["_id"]})
+    assert stored["status"] == "scheduled"
+    assert stored["retry_count"] == 1
+    assert stored["next_attempt_at"] > datetime.utcnow()
+    assert stored["error_history"][0]["worker_id"] == "crashed"
+    assert "worker_id" not in stored and "lease_expires_at" not in stored
+
+
+async def test_post_that_keeps_expiring_is_dead_lettered(database, published):
+    post = await running_post(database, retry_count=worker.SCHEDULER_MAX_ATTEMPTS - 1)
+
+    await worker.reap_expired_leases()
+
+    stored = await database.scheduled_posts.find_one({"_id": post["_id"]})
+    assert stored["status"] == "dead"
+    assert len(stored["error_history"]) == 1
+
+
+async def test_live_claims_are_not_reaped(database, published):
+    await running_post(database, expired=False)
+
+    assert await worker.reap_expired_leases() == 0
+
+
+async def test_expired_claim_already_published_is_not_charged(database, published):
+    post = await running_post(database)
+    await database.publications.insert_one({"_id": post["_id"], "state": "published", "published_at": datetime.utcnow()})
+
+    await worker.reap_expired_leases()
+
+    stored = await database.scheduled_posts.find_one({"_id": post["_id"]})
+    assert (stored["status"], stored["retry_count"]) == ("scheduled", 0)
+
+
+async def test_every_post_is_published_once_after_a_worker_crash(database, published, monkeypatch):
+    monkeypatch.setattr(worker, "SCHEDULER_LEASE_SECONDS", 0.2)
+    monkeypatch.setattr(worker, "SCHEDULER_RETRY_BASE_SECONDS", 0.05)
+    now = datetime.utcnow()
+    await database.scheduled_posts.insert_many([
+        {"user_email": USER, "content": f"Post {i}", "status": "scheduled",
+         "scheduled_time": now, "next_attempt_at": now, "retry_count": 0}
+        for i in range(30)
+    ])
+
+    # Worker A dies after publishing one post, before recording that it went out...
+    post = await worker.claim_next_post("worker-a")
+    await worker.begin_publication(post, "worker-a")
+    await worker.publish_post(post, str(post["_id"]))
+
+    # ...and again in the middle of a batch, while several publishes are in flight
+    batch = asyncio.ensure_future(worker.process_scheduled_posts("worker-a"))
+    await wait_until(lambda: sum(published.values()) >= 10)
+    batch.cancel()
+    await asyncio.gather(batch, return_exceptions=True)
+    assert await database.scheduled_posts.count_documents({"status": "running"}) > 1
+
+    # Worker B recovers the stuck posts once their leases expire and drains the queue
+    async def posted() -> int:
+        return await database.scheduled_posts.count_documents({"status": "posted"})
+
+    deadline = asyncio.get_running_loop().time() + 10
+    while await posted() < 30:
+        assert asyncio.get_running_loop().time() < deadline, "queue did not drain"
+        await worker.reap_expired_leases()
+        await worker.process_scheduled_posts("worker-b")
+        await asyncio.sleep(0.05)
+
+    assert len(published) == 30
+    assert set(published.values()) == {1}
+    # The cut-off publish was sent again under the same key, and the API dropped it
+    assert published.repeats[post["content"]] == 1
+    assert await database.publications.count_documents({"state": "published"}) == 30
+    assert worker.scheduler_stats["reaped"] > 1
+
+
+async def test_lease_is_renewed_while_a_slow_publish_runs(database, published, monkeypatch):
+    monkeypatch.setattr(worker, "SCHEDULER_LEASE_SECONDS", 0.2)
+    publish = worker.publish_post
+
+    async def slow_publish(post, idempotency_key):
+        await asyncio.sleep(0.6)
+        await publish(post, idempotency_key)
+
+    monkeypatch.setattr(worker, "publish_post", slow_publish)
+    now = datetime.utcnow()
+    await database.scheduled_posts.insert_one({
+        "user_email": USER, "content": "Slow", "status": "scheduled",
+        "scheduled_time": now, "next_attempt_at": now, "retry_count": 0
+    })
+
+    processing = asyncio.ensure_future(worker.process_scheduled_posts("worker-a"))
+    while not processing.done():
+        assert await worker.reap_expired_leases() == 0
+        await asyncio.sleep(0.05)
+
+    stored = await database.scheduled_posts.find_one({})
+    assert (stored["status"], stored["retry_count"]) == ("posted", 0)
+    assert published == {"Slow": 1}
@@ -0,0 +1,66 @@
+import time
+import pytest
+from ai import providers, service
+from ai.resilience import breaker
+from tests.conftest import quota_used, wait_until
+
+pytestmark = [pytest.mark.anyio, pytest.mark.usefixtures("fast_stub")]
+
+MESSAGES = [{"role": "user", "content": "Topic: Remote work"}]
+
+
+async def test_stream_sends_tokens_then_done(client, database):
+    response = await client.post("/ai/generate/stream", json={"topic": "Remote work"})
+
+    assert response.status_code == 200
+    assert "event: token" in response.text
+    assert "event: done" in response.text
+    assert await quota_used(database) == 1
+
+
+async def test_open_circuit_rejects_stream_with_503(client, database, monkeypatch):
+    monkeypatch.setattr(breaker, "state", "open")
+    monkeypatch.setattr(breaker, "opened_at", time.monotonic())
+
+    response = await client.post("/ai/generate/stream", json={"topic": "Remote work"})
+
+    assert response.status_code == 503
+    assert await quota_used(database) == 0
+
+
+async def test_failed_stream_refunds_quota(client, database, monkeypatch):
+    monkeypatch.setattr(providers, "STUB_ERROR_RATE", 1.0)
+
+    response = await client.post("/ai/generate/stream", json={"topic": "Remote work"})
+
+    assert response.status_code == 200
+    assert "event: error" in response.text
+    assert "event: token" not in response.text
+    assert await quota_used(database) == 0
+
+
+async def test_first_token_arrives_before_the_completion_finishes(fake_groq):
+    fake_groq.latency, fake_groq.chunk_delay = 0.1, 0.05
+
+    started = time.perf_counter()
+    deltas = service.stream_linkedin_post(topic="Remote work")
+    await deltas.__anext__()
+    time_to_first_byte = time.perf_counter() - started
+    rest = [delta async for delta in deltas]
+    total = time.perf_counter() - started
+
+    assert len(rest) == len(fake_groq.WORDS) - 1
+    assert time_to_first_byte < fake_groq.latency + 0.2
+    assert total > fake_groq.chunk_delay * len(rest)
+
+
+async def test_abandoned_groq_stream_is_closed(fake_groq):
+    fake_groq.latency, fake_groq.chunk_delay = 0, 0.1
+
+    deltas = fake_groq.provider.stream(MESSAGES, temperature=0.7, max_tokens=320)
+    await deltas.__anext__()
+    await deltas.aclose()
+
+    # The full stream would take seconds; the server sees the disconnect at once
+    await wait_until(lambda: fake_groq.streams_abandoned == 1, timeout=1)
+    assert fake_groq.streams_finished == 0
@@ -0,0 +1,29 @@
+from db.mongodb import database
+from utils.lru_cache import TTLCache
+
+DEFAULT_PREFERENCES = {
+    "default_tone": "professional",
+    "default_length": "medium",
+    "notifications_enabled": True,
+    "timezone": "UTC"
+}
+
+# Short-lived cache so generation does not read preferences on every request
+preferences_cache = TTLCache(10000, 60)
+
+
+async def load_preferences(user_email: str) -> dict:
+    """Return the user's preferences merged over the defaults"""
+    prefs = preferences_cache.get(user_email)
+    if prefs is not None:
+        return prefs
+
+    record = await database.user_preferences.find_one({"user_email": user_email}) or {}
+    prefs = {key: record.get(key, default) for key, default in DEFAULT_PREFERENCES.items()}
+    preferences_cache.set(user_email, prefs)
+    return prefs
+
+
+def invalidate_preferences(user_email: str) -> None:
+    """Drop the cached preferences after an update"""
+    preferences_cache.delete(user_email)
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from auth.dependencies import get_current_user
 from db.mongodb import database
 from user_profile.schemas import ProfileUpdate, PasswordChange, UserPreferences
+from user_profile.preferences import load_preferences, invalidate_preferences
 from passlib.context import CryptContext
 
 router = APIRouter(prefix="/profile", tags=["Profile"])
@@ -71,23 +72,7 @@ async def change_password(
 @router.get("/preferences")
 async def get_preferences(user_email: str = Depends(get_current_user)):
     """Get user preferences"""
-    prefs = await database.user_preferences.find_one({"user_email": user_email})
-    
-    if not prefs:
-        # Return defaults
-        return {
-            "default_tone": "professional",
-            "default_length": "medium",
-            "notifications_enabled": True,
-            "timezone": "UTC"
-        }
-    
-    return {
-        "default_tone": prefs.get("default_tone", "professional"),
-        "default_length": prefs.get("default_length", "medium"),
-        "notifications_enabled": prefs.get("notifications_enabled", True),
-        "timezone": prefs.get("timezone", "UTC")
-    }
+    return await load_preferences(user_email)
 
 
 @router.put("/preferences")
@@ -101,5 +86,6 @@ async def update_preferences(
         {"$set": preferences.dict(exclude_none=True)},
         upsert=True
     )
+    invalidate_preferences(user_email)
     
     return {"message": "Preferences updated successfully"}
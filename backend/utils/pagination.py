@@ -0,0 +1,83 @@
+import base64
+from typing import Any, Optional, Tuple
+from bson import json_util
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(sort_field: str, value: Any, doc_id: Any) -> str:
+    """Opaque cursor holding the last item's sort value and _id"""
+    raw = json_util.dumps({"s": sort_field, "v": value, "id": doc_id})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_field: str) -> Tuple[Any, Any]:
+    """Return (sort value, _id) from a cursor made for the same sort field"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if data["s"] != sort_field:
+            raise ValueError("cursor was issued for a different sort")
+        return data["v"], data["id"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def page_size(limit: Optional[int]) -> int:
+    """Clamp a client-chosen page size"""
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def keyset_filter(sort_field: str, direction: int, value: Any, doc_id: Any) -> dict:
+    """Filter for the items strictly after (value, _id) in (sort_field, _id) order"""
+    op = "$lt" if direction == -1 else "$gt"
+    return {"$or": [
+        {sort_field: {op: value}},
+        {sort_field: value, "_id": {op: doc_id}},
+    ]}
+
+
+def add_filter(query: dict, condition: dict) -> dict:
+    """AND a condition into a query without clobbering existing operators"""
+    query.setdefault("$and", []).append(condition)
+    return query
+
+
+async def paginate(
+    collection,
+    query: dict,
+    sort_field: str,
+    direction: int,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    projection: Optional[dict] = None
+) -> Tuple[list, Optional[str]]:
+    """
+    Fetch one page ordered by (sort_field, _id) using keyset pagination,
+    so every page costs the same index seek no matter how deep it is.
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    size = page_size(limit)
+
+    if cursor:
+        value, doc_id = decode_cursor(cursor, sort_field)
+        add_filter(query, keyset_filter(sort_field, direction, value, doc_id))
+
+    # Fetch one extra item to know whether another page exists
+    items = await collection.find(query, projection).sort(
+        [(sort_field, direction), ("_id", direction)]
+    ).limit(size + 1).to_list(size + 1)
+
+    next_cursor = None
+    if len(items) > size:
+        items = items[:size]
+        last = items[-1]
+        next_cursor = encode_cursor(sort_field, last.get(sort_field), last["_id"])
+
+    return items, next_cursor
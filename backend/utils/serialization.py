@@ -0,0 +1,65 @@
+from typing import Any, Annotated, Iterable, Optional
+import orjson
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field
+
+# A Mongo ObjectId, validated straight from the raw document and sent as a string
+PyObjectId = Annotated[str, BeforeValidator(lambda v: str(v) if isinstance(v, ObjectId) else v)]
+
+
+class MongoModel(BaseModel):
+    """
+    Base for response models built directly from Mongo documents.
+    Routes return the raw documents and FastAPI validates and serializes
+    them in one pass, so there is no per-document conversion in Python.
+    """
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: PyObjectId = Field(alias="_id")
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to JSON with orjson; datetimes become ISO strings and ObjectIds strings"""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class MongoJSONResponse(JSONResponse):
+    """JSON response for free-form payloads that contain raw BSON values"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def field_projection(
+    fields: Optional[str],
+    allowed: Iterable[str],
+    required: Iterable[str] = ()
+) -> Optional[dict]:
+    """
+    Turn a comma separated `fields` query parameter into a Mongo projection.
+    `required` fields (e.g. the sort key a cursor is built from) are always
+    included. Returns None when no fields were requested.
+    """
+    if not fields:
+        return None
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields {unknown}, expected any of {sorted(allowed)}"
+        )
+
+    projection = {"_id": 1}
+    for field in [*requested, *required]:
+        projection[field] = 1
+    return projection
@@ -0,0 +1,142 @@
+"""
+Response serialization benchmark for /posts/all and /analytics/overview.
+
+Requests each endpoint through the app in-process (httpx ASGITransport), with
+the database reads replaced by prebuilt documents, so only the routing and
+serialization work is timed. "before" is the pre-response-model code path:
+per-document _id/isoformat conversion in Python, then FastAPI's default
+jsonable_encoder. "after" is the current route with its response model, and
+for /posts/all also with fields=content,created_at:
+
+    python -m utils.serialization_bench [--page 500] [--content-bytes 2000] [--days 365] [--requests 50]
+
+No MongoDB is needed; the numbers leave out query time, which the fields=
+projection also reduces on a real database.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+import httpx
+from bson import ObjectId
+from fastapi import FastAPI
+
+import main
+from analytics import cache as analytics_cache
+from auth.dependencies import get_current_user
+from posts import routes as post_routes
+
+USER = "bench@example.com"
+
+
+def make_posts(count: int, content_bytes: int) -> list:
+    rng = random.Random(1)
+    now = datetime.utcnow()
+    return [{
+        "_id": ObjectId(),
+        "user_email": USER,
+        "content": "".join(rng.choice("abcdefgh ") for _ in range(content_bytes)),
+        "tone": rng.choice(["casual", "professional", "inspiring"]),
+        "engagement_score": round(rng.uniform(0.5, 1.0), 2),
+        "views": rng.randint(0, 500),
+        "clicks": rng.randint(0, 50),
+        "shares": rng.randint(0, 10),
+        "created_at": now - timedelta(minutes=i),
+        "updated_at": now,
+    } for i in range(count)]
+
+
+def make_overview(days: int) -> dict:
+    today = datetime.utcnow().date()
+    return {
+        "total_posts": days * 3,
+        "avg_engagement": 0.74,
+        "total_views": days * 900,
+        "total_clicks": days * 60,
+        "total_shares": days * 9,
+        "engagement_trend": [
+            {"date": (today - timedelta(days=i)).isoformat(), "score": 0.74} for i in range(days, 0, -1)
+        ]
+    }
+
+
+def before_app(posts: list, overview: dict) -> FastAPI:
+    """The two routes as they serialized before the response models"""
+    app = FastAPI()
+
+    @app.get("/posts/all")
+    async def get_all_posts():
+        page = [dict(post) for post in posts]
+        for post in page:
+            post["_id"] = str(post["_id"])
+            post["created_at"] = post["created_at"].isoformat()
+            if "updated_at" in post:
+                post["updated_at"] = post["updated_at"].isoformat()
+        return {"items": page, "next_cursor": None}
+
+    @app.get("/analytics/overview")
+    async def get_analytics_overview():
+        return overview
+
+    return app
+
+
+def stub_reads(posts: list, overview: dict) -> None:
+    """Serve the current routes' reads from memory"""
+    async def paginate(collection, query, sort_field, direction, limit=None, cursor=None, projection=None):
+        if projection and all(value == 1 for value in projection.values()):
+            return [{field: post[field] for field in projection} for post in posts], None
+        return [dict(post) for post in posts], None
+
+    async def cached(key: str) -> Optional[dict]:
+        return overview
+
+    post_routes.paginate = paginate
+    analytics_cache.get_cached = cached
+    main.app.dependency_overrides[get_current_user] = lambda: USER
+
+
+async def measure(app: FastAPI, url: str, requests: int) -> tuple:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get(url)  # Warm up
+        timings = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = await client.get(url)
+            timings.append(time.perf_counter() - started)
+            response.raise_for_status()
+    return statistics.median(timings) * 1000, len(response.content)
+
+
+async def run(page: int, content_bytes: int, days: int, requests: int) -> None:
+    posts = make_posts(page, content_bytes)
+    overview = make_overview(days)
+    before = before_app(posts, overview)
+    stub_reads(posts, overview)
+
+    cases = [
+        ("/posts/all", "before", before, "/posts/all"),
+        ("/posts/all", "after", main.app, "/posts/all"),
+        ("/posts/all", "after, fields=content,created_at", main.app, "/posts/all?fields=content,created_at"),
+        ("/analytics/overview", "before", before, "/analytics/overview"),
+        ("/analytics/overview", "after", main.app, f"/analytics/overview?days={days}"),
+    ]
+    print(f"{page} posts per page with {content_bytes}-byte content, {days}-day overview, "
+          f"median of {requests} requests")
+    for endpoint, variant, app, url in cases:
+        median_ms, size = await measure(app, url, requests)
+        print(f"{endpoint:<20} {variant:<34} {median_ms:8.2f} ms {size / 1024:9.1f} KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Response serialization benchmark")
+    parser.add_argument("--page", type=int, default=500, help="Posts per /posts/all page")
+    parser.add_argument("--content-bytes", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365, help="Points in the overview trend")
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.page, args.content_bytes, args.days, args.requests))
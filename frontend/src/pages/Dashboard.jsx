@@ -25,8 +25,8 @@ export default function Dashboard() {
                 setData(analytics);
 
                 // Fetch recent posts
-                const posts = await apiRequest("/posts/all", "GET", null, token);
-                setRecentPosts(posts.slice(0, 5)); // Get last 5 posts
+                const posts = await apiRequest("/posts/all?limit=5", "GET", null, token);
+                setRecentPosts(posts.items.slice(0, 5)); // Get last 5 posts
             } catch (err) {
                 setError(err.message);
             } finally {
@@ -11,6 +11,8 @@ import { exportToCSV, exportToPDF } from "../utils/exportUtils";
 export default function Posts() {
     const { token } = useAuth();
     const [posts, setPosts] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState("");
     const [editingPost, setEditingPost] = useState(null);
@@ -45,7 +47,8 @@ export default function Posts() {
                 null,
                 token
             );
-            setPosts(data);
+            setPosts(data.items);
+            setNextCursor(data.next_cursor);
         } catch (err) {
             setError(err.message || "Failed to load posts");
         } finally {
@@ -53,6 +56,28 @@ export default function Posts() {
         }
     }
 
+    async function loadMorePosts() {
+        if (!nextCursor) return;
+        setLoadingMore(true);
+        try {
+            const params = new URLSearchParams();
+            if (searchTerm) params.append("search", searchTerm);
+            if (filterTone) params.append("tone", filterTone);
+            if (filterFavorite) params.append("is_favorite", "true");
+            params.append("sort_by", sortBy);
+            params.append("sort_order", sortOrder);
+            params.append("cursor", nextCursor);
+
+            const data = await apiRequest(`/posts/all?${params.toString()}`, "GET", null, token);
+            setPosts((current) => [...current, ...data.items]);
+            setNextCursor(data.next_cursor);
+        } catch (err) {
+            toast.error(err.message || "Failed to load more posts");
+        } finally {
+            setLoadingMore(false);
+        }
+    }
+
 
     const handleCopy = async (content, postId) => {
         try {
@@ -371,6 +396,18 @@ export default function Posts() {
                         </motion.div>
                     ))}
                 </div>
+
+                {nextCursor && (
+                    <div className="flex justify-center mt-6">
+                        <button
+                            onClick={loadMorePosts}
+                            disabled={loadingMore}
+                            className="px-6 py-2 bg-blue-600 hover:bg-blue-700 disabled:opacity-50 text-white rounded-lg font-medium transition-colors"
+                        >
+                            {loadingMore ? "Loading..." : "Load more"}
+                        </button>
+                    </div>
+                )}
             </div>
 
             {/* Edit Modal */}
@@ -19,7 +19,7 @@ export default function ScheduledPosts() {
                     null,
                     token
                 );
-                setPosts(data);
+                setPosts(data.items);
             } catch (err) {
                 setError(err.message || "Failed to load scheduled posts");
             } finally {
@@ -92,6 +92,7 @@ function StatusBadge({ status }) {
         running: "bg-blue-100 text-blue-700",
         posted: "bg-green-100 text-green-700",
         failed: "bg-red-100 text-red-700",
+        dead: "bg-red-100 text-red-700",
     };
 
     return (
@@ -22,7 +22,7 @@ export default function Templates() {
         setLoading(true);
         try {
             const data = await apiRequest("/templates", "GET", null, token);
-            setTemplates(data);
+            setTemplates(data.items);
         } catch (err) {
             setError(err.message || "Failed to load templates");
         } finally {